@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+"""
+Measure how long it takes to render and encode typical frames
+and how many PIL images are allocated while doing so.
+No display hardware is needed, the messages are discarded.
+"""
+
+import argparse
+import time
+
+import displays
+from PIL import Image
+
+class NullManager:
+    """
+    A display manager which discards all messages.
+    """
+
+    def __init__(self):
+        self.displays = {}
+        self.frame_digests = {}
+
+    def send_message(self, port, message, expect_reply = True):
+        return 0xFF
+
+def clock_frame(display, n):
+    display.text("{0:02d}{1:02d}".format(n // 60 % 24, n % 60),
+        font = "Luminator16_Bold", left = 1)
+
+def weather_frame(display, n):
+    width = 42
+    for index in range(3):
+        xbase = width * index
+        display.bitmap("bitmaps/weather_icons/wettercom/{0}.png".format(
+            (n + index) % 10), left = xbase, top = 0)
+        display.text("{0}/{1}°".format(n % 30, index),
+            font = "Flipdot8_Narrow", left = xbase + 17, top = 0)
+        display.text("{0}kmh".format(n % 50), font = "Flipdot8_Narrow",
+            left = xbase + 17, top = 9)
+    display.line([width - 2, 0, width - 2, 15], width = 1)
+    display.line([2 * width - 2, 0, 2 * width - 2, 15], width = 1)
+
+def ticker_frame(display, n):
+    display.text("Frame {0}: The quick brown fox jumps over the lazy dog"
+        .format(n), font = "Flipdot8_Narrow", halign = 'left')
+    display.rectangle([0, 0, 799, 7])
+
+SCENARIOS = (
+    ('clock', clock_frame, lambda h: displays.LAWOFlipdotDisplay(28, 16,
+        font_handler = h)),
+    ('weather', weather_frame, lambda h: displays.LAWOFlipdotDisplay(126, 16,
+        font_handler = h)),
+    ('ticker', ticker_frame, lambda h: displays.AnnaxLEDDisplay(120, 8,
+        bitmap_width = 800, font_handler = h)),
+)
+
+def run(display, frame, frames):
+    for n in range(frames):
+        frame(display, n)
+        display.commit()
+
+def count_images(display, frame, frames):
+    """
+    Count the PIL images created while rendering the frames.
+    """
+
+    count = 0
+    original_init = Image.Image.__init__
+    def counting_init(*args, **kwargs):
+        nonlocal count
+        count += 1
+        original_init(*args, **kwargs)
+
+    Image.Image.__init__ = counting_init
+    try:
+        run(display, frame, frames)
+    finally:
+        Image.Image.__init__ = original_init
+    return count
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-f', '--frames', type = int, default = 500)
+    parser.add_argument('-r', '--repeat', type = int, default = 5)
+    args = parser.parse_args()
+
+    handler = displays.FontHandler()
+    for name, frame, factory in SCENARIOS:
+        display = factory(handler)
+        display.manager = NullManager()
+        display.port = 0
+        # Warm up
+        run(display, frame, 10)
+
+        # Use the fastest of several runs to reduce the influence
+        # of other processes
+        durations = []
+        for repeat in range(args.repeat):
+            start = time.perf_counter()
+            run(display, frame, args.frames)
+            durations.append(time.perf_counter() - start)
+        duration = min(durations)
+
+        images = count_images(display, frame, args.frames)
+
+        print("{0:10} {1:8.3f} ms/frame {2:8.2f} images/frame".format(
+            name, duration * 1000 / args.frames, images / args.frames))
+
+if __name__ == "__main__":
+    main()
@@ -22,4 +22,6 @@ from .font_handler import FontHandler
 from .display_lawo_flipdot import LAWOFlipdotDisplay
 from .display_adtranz_lcd import ADtranzLCDisplay
 from .display_brose_lva import BroseLVADisplay
-from .display_annax_led import AnnaxLEDDisplay
\ No newline at end of file
+from .display_annax_led import AnnaxLEDDisplay
+from .display_virtual import VirtualDisplay
+from .display_group import DisplayGroup
\ No newline at end of file
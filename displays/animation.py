@@ -0,0 +1,187 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the code for playing animations on bitmap displays.
+"""
+
+import hashlib
+import time
+
+from PIL import Image, ImageSequence
+
+# The duration of a frame in seconds if the animation doesn't specify one
+DEFAULT_DURATION = 0.1
+
+def load_frames(source, duration = None):
+    """
+    Decode an animation into a list of tuples (image, duration).
+
+    source:
+    The path of an animated image file (e.g. GIF or APNG), a PIL image
+    or a list of frames. Frames can be file paths, PIL images or sprites,
+    or tuples (frame, duration) with the duration in seconds.
+
+    duration:
+    The duration of every frame in seconds, overriding the durations
+    of the animation
+    """
+
+    frames = []
+    if isinstance(source, (list, tuple)):
+        for frame in source:
+            frame_duration = None
+            if isinstance(frame, (list, tuple)):
+                frame, frame_duration = frame
+            if isinstance(frame, str):
+                frame = Image.open(frame)
+            frames.append((frame, frame_duration))
+    else:
+        image = source
+        if isinstance(source, str):
+            image = Image.open(source)
+        for frame in ImageSequence.Iterator(image):
+            # Durations are stored in milliseconds
+            frame_duration = frame.info.get('duration')
+            if frame_duration:
+                frame_duration /= 1000
+            frames.append((frame.convert("RGBA"), frame_duration))
+    if not frames:
+        raise ValueError("The animation doesn't contain any frames")
+    return [(frame, duration or frame_duration or DEFAULT_DURATION)
+        for frame, frame_duration in frames]
+
+class Animation:
+    """
+    An animation for a display, decoded and encoded once so it can be
+    played any number of times. Every frame is encoded both as a full
+    message and as a partial update from the frame before it.
+    """
+
+    def __init__(self, display, frames, **kwargs):
+        """
+        display:
+        The bitmap display to encode the animation for
+
+        frames:
+        A list of tuples (image, duration) as returned by load_frames()
+
+        kwargs:
+        Same as for BitmapDisplay.bitmap(), used to place and convert
+        every frame
+        """
+
+        # The frames are drawn and encoded by a copy of the display
+        # with its own bitmap, so the display itself stays untouched
+        encoder = display._make_encoder()
+
+        self.bitmaps = []
+        self.messages = []
+        self.digests = []
+        self.durations = []
+        for image, duration in frames:
+            encoder.fb.clear()
+            encoder.bitmap(image, **kwargs)
+            message = bytes(encoder.encode())
+            self.bitmaps.append(encoder.fb.copy())
+            self.messages.append(message)
+            self.digests.append(hashlib.sha1(message).digest())
+            self.durations.append(duration)
+
+        # Partial updates, the first frame being updated from the last one
+        # when the animation loops
+        self.updates = []
+        for index, fb in enumerate(self.bitmaps):
+            encoder.fb = fb
+            update = encoder.encode_update(self.bitmaps[index - 1])
+            self.updates.append(None if update is None else bytes(update))
+
+    def __len__(self):
+        return len(self.messages)
+
+    @property
+    def nbytes(self):
+        return sum(len(message) for message in self.messages) + \
+            sum(len(update) for update in self.updates if update) + \
+            sum(len(fb.data) for fb in self.bitmaps)
+
+    @property
+    def total_duration(self):
+        return sum(self.durations)
+
+    def play(self, display, loops = 1):
+        """
+        Play the animation on a display. Every frame is shown at its time
+        after the start; if the display can't keep up, frames whose time
+        has already passed are dropped instead of slowing down.
+        Returns a dict with the number of frames shown and dropped.
+
+        display:
+        The display to play the animation on, of the same kind as the one
+        it was encoded for
+
+        loops:
+        The number of times to play the animation
+        """
+
+        if loops < 1:
+            raise ValueError("The animation has to be played at least once")
+        count = len(self.messages)
+        starts = []
+        offset = 0.0
+        for duration in self.durations:
+            starts.append(offset)
+            offset += duration
+        total = offset
+
+        def _due(frame):
+            loop, index = divmod(frame, count)
+            return start + loop * total + starts[index]
+
+        last = count * loops
+        shown_frames = dropped = 0
+        # The frame the display shows, None if unknown
+        shown = None
+        last_digest = display.manager.frame_digests.get(display.port)
+        if last_digest is not None and last_digest == self.digests[-1]:
+            shown = count - 1
+
+        try:
+            start = time.monotonic()
+            frame = 0
+            while frame < last:
+                now = time.monotonic()
+                delay = _due(frame) - now
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    # Skip to the latest frame that is due
+                    while frame + 1 < last and _due(frame + 1) <= now:
+                        frame += 1
+                        dropped += 1
+                index = frame % count
+                if shown is not None and \
+                self.digests[shown] == self.digests[index]:
+                    # The display already shows this bitmap
+                    pass
+                elif shown == (index - 1) % count and \
+                self.updates[index] is not None:
+                    display.send_message(self.updates[index])
+                else:
+                    display.send_message(self.messages[index])
+                shown = index
+                display.manager.frame_digests[display.port] = \
+                    self.digests[index]
+                shown_frames += 1
+                frame += 1
+
+            # Keep the last frame for its duration
+            delay = _due(last) - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        except:
+            # What the display shows is unknown
+            display.manager.frame_digests.pop(display.port, None)
+            display.committed_fb = None
+            raise
+        display.committed_fb = self.bitmaps[shown].copy()
+        return {'shown': shown_frames, 'dropped': dropped}
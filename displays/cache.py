@@ -0,0 +1,120 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains a simple cache used to keep rendered bitmaps around.
+"""
+
+import collections
+import threading
+
+class LRUCache:
+    """
+    A cache which discards the least recently used items once the total
+    size of its items exceeds a limit.
+    """
+
+    def __init__(self, max_size, max_items = None):
+        """
+        max_size:
+        The maximum total size of all items (e.g. in bytes)
+
+        max_items:
+        The maximum number of items, no limit if this is None
+        """
+
+        self.max_size = max_size
+        self.max_items = max_items
+        self.items = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def get(self, key, default = None):
+        """
+        Get an item from the cache and mark it as recently used.
+
+        key:
+        The key of the item
+
+        default:
+        The value to return if the item is not cached
+        """
+
+        with self.lock:
+            try:
+                value, size = self.items[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, size = 1):
+        """
+        Add an item to the cache, discarding old items if necessary.
+        Items bigger than the maximum size are not cached at all.
+
+        key:
+        The key of the item
+
+        value:
+        The item to cache
+
+        size:
+        The size of the item
+        """
+
+        with self.lock:
+            if key in self.items:
+                self.size -= self.items.pop(key)[1]
+            if size > self.max_size:
+                return
+            self.items[key] = (value, size)
+            self.size += size
+            while self.size > self.max_size or (self.max_items is not None
+                    and len(self.items) > self.max_items):
+                self.size -= self.items.popitem(last = False)[1][1]
+
+    def discard(self, key):
+        """
+        Remove an item from the cache if it is cached.
+
+        key:
+        The key of the item
+        """
+
+        with self.lock:
+            if key in self.items:
+                self.size -= self.items.pop(key)[1]
+
+    def clear(self):
+        """
+        Remove all items from the cache and reset the statistics.
+        """
+
+        with self.lock:
+            self.items.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self):
+        """
+        Get the cache statistics as a dictionary.
+        """
+
+        return {
+            'items': len(self.items),
+            'size': self.size,
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses
+        }
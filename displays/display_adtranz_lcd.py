@@ -4,6 +4,7 @@
 
 import math
 
+from . import packing
 from .display_bitmap import BitmapDisplay
 
 class ADtranzLCDisplay(BitmapDisplay):
@@ -17,25 +18,22 @@ class ADtranzLCDisplay(BitmapDisplay):
         return "ADtranz LCD Display '{name}' ({width} x {height})".format(
             name = self.name, width = self.width, height = self.height)
 
-    def commit(self):
+    def encode(self):
         """
-        Send the current internal bitmap to the display.
+        Encode the current internal bitmap into a message for the display.
         
         BITMAP FORMAT:
         A list of bytes, each one representing a horizontal slice of 8 pixels,
         slices going from top to bottom, columns of slices going left to right
         """
         
-        pixels = self.img.load()
-        width, height = self.img.size
-        bitmap = [0] * height * math.ceil(width/8)
-        for x in range(width):
-            for y in range(height):
-                bitmap[x//8*height + y] |= (pixels[x, y] > 127) << x%8
-        
-        self.init_image()
-        return self.send_message(
-            [0xFF, 0xA0, len(bitmap) >> 8 & 0xFF, len(bitmap) & 0xFF] + bitmap)
+        width, height = self.fb.size
+        length = height * math.ceil(width/8)
+        message = self.get_tx_buffer(4 + length)
+        message[0:4] = (0xFF, 0xA0, length >> 8 & 0xFF, length & 0xFF)
+        packing.pack_slices(self.fb.data, width, height,
+            message, 4)
+        return message
     
     def set_backlight(self, level):
         """
@@ -4,6 +4,7 @@
 
 import math
 
+from . import packing
 from .display_bitmap import BitmapDisplay
 
 class AnnaxLEDDisplay(BitmapDisplay):
@@ -17,29 +18,21 @@ class AnnaxLEDDisplay(BitmapDisplay):
         return "ANNAX LED Display '{name}' ({width} x {height})".format(
             name = self.name, width = self.width, height = self.height)
 
-    def commit(self):
+    def encode(self):
         """
-        Send the current internal bitmap to the display.
+        Encode the current internal bitmap into a message for the display.
         
         BITMAP FORMAT:
         Whole rows (left to right), going from top to bottom
         """
         
-        pixels = self.img.load()
-        width, height = self.img.size
-        bitmap = []
-        for y in range(height):
-            for x in range(0, width, 8):
-                byte = 0x00
-                for xoff in range(8):
-                    if x+xoff >= width:
-                        continue
-                    byte |= (pixels[x+xoff, y] > 127) << (7-xoff)
-                bitmap.append(byte)
-        
-        self.init_image()
-        return self.send_message(
-            [0xFF, 0xA0, len(bitmap) >> 8 & 0xFF, len(bitmap) & 0xFF] + bitmap)
+        width, height = self.fb.size
+        length = math.ceil(width/8) * height
+        message = self.get_tx_buffer(4 + length)
+        message[0:4] = (0xFF, 0xA0, length >> 8 & 0xFF, length & 0xFF)
+        packing.pack_rows(self.fb.data, width, height,
+            message, 4)
+        return message
     
     def set_display_mode(self, mode):
         """
@@ -24,7 +24,7 @@ class BaseDisplay:
         self.port = None
         self.name = name
     
-    def commit(self):
+    def commit(self, force = False):
         """
         Dummy so that there will be no error when the server tries to commit
         """
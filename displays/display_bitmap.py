@@ -5,12 +5,28 @@ This file contains the code for basic bitmap display functionality.
 Other classes are built upon it.
 """
 
+import copy
 import datetime
+import hashlib
 import math
+import os
+import time
 
+from .animation import Animation, load_frames
+from .cache import LRUCache
 from .display_base import BaseDisplay
+from .dither import convert_image
 from .font_handler import FontHandler
-from PIL import Image, ImageDraw
+from .frame_table import FrameTable
+from .framebuffer import Framebuffer, Sprite
+from .layer import Layer, composite
+from .metrics import FontMetrics
+from .pipeline import Pipeline
+from .scene import Scene, clip_sprite, merge_bboxes
+from .scroller import Scroller
+from .ticker import Ticker
+from .transitions import EFFECTS
+from PIL import Image, ImageColor, ImageDraw
 
 class BitmapDisplay(BaseDisplay):
     """
@@ -19,6 +35,34 @@ class BitmapDisplay(BaseDisplay):
     
     DEFAULT_FONT = "Sans"
     
+    # Rendered texts, shared by all displays (limited to 1 MB)
+    text_cache = LRUCache(1024 * 1024)
+    
+    # Single chars for vertical texts and tickers, shared by all displays
+    # (limited to 1 MB)
+    glyph_cache = LRUCache(1024 * 1024)
+    
+    # Decoded bitmap files, shared by all displays (limited to 4 MB)
+    asset_cache = LRUCache(4 * 1024 * 1024)
+    
+    # Character measurements by font and size, shared by all displays
+    # (limited to 256 fonts)
+    metrics_cache = LRUCache(256)
+    
+    # Frame tables of clock widgets by parameters, shared by all displays
+    # (limited to 32 tables)
+    frame_tables = LRUCache(32)
+    
+    # Encoded animation files by display kind, shared by all displays
+    # (limited to 4 MB)
+    animation_cache = LRUCache(4 * 1024 * 1024)
+    
+    # Directory to store the frame tables in (not stored if None)
+    FRAME_TABLE_DIR = None
+    
+    # Policies for fitting texts into a box, see text()
+    FIT_POLICIES = ('shrink', 'fallback', 'ellipsize')
+    
     def __init__(self, width, height, name = None,
         bitmap_width = None, bitmap_height = None, font_handler = None):
         """
@@ -51,6 +95,44 @@ class BitmapDisplay(BaseDisplay):
         self.bitmap_width = bitmap_width or width
         self.bitmap_height = bitmap_height or height
         self.font_handler = font_handler or FontHandler()
+        self.tx_buffer = bytearray()
+        self.skipped_commits = 0
+        # The bitmap sent with the last commit
+        self.committed_fb = None
+        # Whether the bitmap is kept after a commit
+        self.retained = False
+        # The pipeline used for committing, None to commit directly
+        self.pipeline = None
+        # The ticker running in the background, if any
+        self.ticker = None
+        # Scratch image for drawing shapes, reused for every shape
+        self.shape_img = Image.new('1',
+            (self.bitmap_width, self.bitmap_height))
+        self.shape_draw = ImageDraw.Draw(self.shape_img)
+        # Retained scene elements, drawn on top of the bitmap
+        self.scene = Scene()
+        # The internal bitmap without the scene, see render()
+        self.scene_base = None
+        # The last committed bitmap without the scene in non-retained mode,
+        # see commit_regions()
+        self.committed_base = None
+        # Sprites collected by capture(), None if not capturing
+        self.captured = None
+        # The area drawing functions position their output in
+        # as (left, top, width, height), the whole display if None
+        self.viewport = None
+        # Named layers; if there are none, everything is drawn directly
+        # into the internal bitmap
+        self.layers = {}
+        self.active_layer = None
+        # The composited layers
+        self.layer_fb = None
+        # Whether layers have been added or removed since the last
+        # composition
+        self.layers_changed = False
+        # Whether the internal bitmap contains the composited layers
+        self.layers_composited = False
+        self.fb = None
         self.init_image()
         
     def init_image(self):
@@ -58,10 +140,920 @@ class BitmapDisplay(BaseDisplay):
         Prepare or reset the internal bitmap.
         """
         
-        self.img = Image.new('L', 
-            (self.bitmap_width, self.bitmap_height), 'black')
-        self.draw = ImageDraw.Draw(self.img)
-        self.draw.fontmode = '1' # No antialiasing
+        if self.fb is None:
+            self.fb = Framebuffer(self.bitmap_width, self.bitmap_height)
+        else:
+            self.fb.clear()
+        for layer in self.layers.values():
+            if not layer.static:
+                layer.clear()
+        self.layers_composited = False
+        self.scene.composited = False
+    
+    def render(self):
+        """
+        Composite the layers and the scene elements into the internal bitmap.
+        This is done automatically before the bitmap is sent or queried.
+        """
+        
+        if self.layers:
+            changed = self.layers_changed or any(
+                layer.dirty for layer in self.layers.values())
+            if changed:
+                composite(self.layers.values(), self.layer_fb)
+                self.layers_changed = False
+            if changed or not self.layers_composited:
+                self.fb.blit(self.layer_fb, 0, 0)
+                self.layers_composited = True
+                self.scene.composited = False
+            # The layers are below the scene, so the areas of changed
+            # elements are restored from them
+            base = self.layer_fb
+        else:
+            if not self.scene.composited and len(self.scene):
+                # Keep the bitmap without the scene, so the areas of changed
+                # elements can be restored from it
+                if self.scene_base is None:
+                    self.scene_base = self.fb.copy()
+                else:
+                    self.scene_base.extract(self.fb, 0, 0)
+            base = self.scene_base
+        self.scene.render(self, self.fb, base)
+    
+    def get_tx_buffer(self, length):
+        """
+        Get the preallocated buffer used to build messages to the display.
+        It is only reallocated if the required length changes.
+        
+        length:
+        The length of the message in bytes
+        """
+        
+        if len(self.tx_buffer) != length:
+            self.tx_buffer = bytearray(length)
+        return self.tx_buffer
+    
+    def encode(self):
+        """
+        Encode the current internal bitmap into a message for the display.
+        Implemented by the display-specific subclasses, returns None
+        for displays without a bitmap format (nothing is sent then).
+        The message is built in the transmit buffer, so it is only valid
+        until the next call of encode().
+        """
+        
+        return None
+    
+    def encode_update(self, previous):
+        """
+        Encode only the parts of the internal bitmap that differ from
+        the bitmap currently shown by the display.
+        Implemented by subclasses whose displays support partial updates,
+        returns None if a full update should be sent instead.
+        
+        previous:
+        The framebuffer currently shown by the display
+        """
+        
+        return None
+    
+    def encode_columns(self, columns, width, height):
+        """
+        Encode a bitmap given as packed columns into a message for
+        the display. Implemented by subclasses whose displays use
+        a column-based format, returns None if the bitmap should be
+        encoded from a framebuffer instead.
+        
+        columns:
+        The columns (top to bottom, going from left to right), 8 pixels
+        per byte with the top pixel being the MSB
+        
+        width:
+        The width of the bitmap in pixels
+        
+        height:
+        The height of the bitmap in pixels
+        """
+        
+        return None
+    
+    def get_dirty_columns(self):
+        """
+        Get the range of columns that changed since the last commit
+        as a tuple (first, last), or None if nothing changed.
+        Before the first commit, all columns are considered changed.
+        """
+        
+        if self.committed_fb is None:
+            return 0, self.bitmap_width - 1
+        return self.fb.get_changed_columns(self.committed_fb)
+    
+    def commit(self, force = False):
+        """
+        Send the current internal bitmap to the display.
+        If the display already shows the same bitmap, nothing is sent
+        and None is returned. If the display supports it, only the changed
+        part of the bitmap is sent.
+        
+        force:
+        Whether to send the full bitmap even if it has not changed
+        """
+        
+        if self.pipeline is not None:
+            # The status is available from the pipeline statistics
+            self.pipeline.submit(force)
+            return None
+        
+        self.render()
+        message = self.encode()
+        if message is None:
+            # Like BaseDisplay.commit(), there is nothing to send
+            return None
+        digest = hashlib.sha1(message).digest()
+        last_digest = self.manager.frame_digests.get(self.port)
+        if not force and last_digest == digest:
+            self.skipped_commits += 1
+            if not self.retained:
+                self.init_image()
+            return None
+        
+        if not force and last_digest is not None and \
+        self.committed_fb is not None:
+            # The display shows the last committed bitmap
+            update = self.encode_update(self.committed_fb)
+            if update is not None:
+                message = update
+        
+        status = self._send_bitmap(message, digest)
+        self._store_committed()
+        return status
+    
+    def _make_encoder(self):
+        """
+        Create a shallow copy of the display for encoding bitmaps other than
+        the internal one. It has its own transmit buffer, so its messages
+        never overwrite one that is still being sent, and its own blank
+        bitmap without layers, scene elements or viewport.
+        """
+        
+        encoder = copy.copy(self)
+        encoder.tx_buffer = bytearray()
+        encoder.fb = Framebuffer(self.bitmap_width, self.bitmap_height)
+        encoder.committed_fb = None
+        encoder.layers = {}
+        encoder.scene = Scene()
+        encoder.scene_base = None
+        encoder.committed_base = None
+        encoder.captured = None
+        encoder.viewport = None
+        encoder.pipeline = None
+        encoder.ticker = None
+        return encoder
+    
+    def _send_paced(self, get_message, interval, duration = None):
+        """
+        Send messages at a constant rate, e.g. the frames of a scrolling
+        bitmap. If sending takes longer than the interval, the frames that
+        are late are not caught up on. Afterwards, the display doesn't show
+        the internal bitmap anymore. Returns the number of messages sent.
+        
+        get_message:
+        A function returning the message for a frame or None to stop,
+        called with the number of the frame and the time it is due
+        (see time.monotonic()) before waiting for that time
+        
+        interval:
+        The time between two frames in seconds
+        
+        duration:
+        The maximum time to send for in seconds (unlimited if None)
+        """
+        
+        start = time.monotonic()
+        frame = 0
+        try:
+            while True:
+                deadline = start + frame * interval
+                if duration is not None and deadline - start >= duration:
+                    break
+                message = get_message(frame, deadline)
+                if message is None:
+                    break
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                elif -delay > interval:
+                    # Don't try to catch up on the frames that are late
+                    start -= delay
+                self.send_message(message)
+                frame += 1
+        finally:
+            self.manager.frame_digests.pop(self.port, None)
+            self.committed_fb = None
+        return frame
+    
+    def _send_bitmap(self, message, digest):
+        """
+        Send an encoded bitmap and remember its digest. If sending fails,
+        the digest is forgotten, since it is unknown what the display
+        shows, and the next bitmap is sent in full.
+        
+        message:
+        The encoded bitmap
+        
+        digest:
+        The digest of the full bitmap
+        """
+        
+        try:
+            status = self.send_message(message)
+        except:
+            self.manager.frame_digests.pop(self.port, None)
+            raise
+        self.manager.frame_digests[self.port] = digest
+        return status
+    
+    def _store_committed(self):
+        """
+        Remember the internal bitmap as the one shown by the display
+        and prepare the next one.
+        """
+        
+        if self.retained:
+            if self.committed_fb is None:
+                self.committed_fb = self.fb.copy()
+            else:
+                self.committed_fb.blit(self.fb, 0, 0)
+        else:
+            # Swap the buffers so neither of them has to be reallocated
+            self.committed_fb, self.fb = self.fb, self.committed_fb
+            self._store_committed_base()
+            self.init_image()
+    
+    def _store_committed_base(self):
+        """
+        Remember the bitmap below the scene of a bitmap that is committed
+        in non-retained mode, so regions can be composited into it later.
+        """
+        
+        if not len(self.scene):
+            self.committed_base = None
+            return
+        base = self.layer_fb if self.layers else self.scene_base
+        if self.committed_base is None:
+            self.committed_base = base.copy()
+        else:
+            self.committed_base.extract(base, 0, 0)
+    
+    def commit_regions(self, force = False):
+        """
+        Send the bitmap shown by the display with the changed scene elements
+        rendered again, e.g. after refresh_regions(). In retained mode,
+        this is the same as commit(). Otherwise, the internal bitmap has
+        been cleared by the last commit, so the changed elements are
+        composited into the last committed bitmap instead and the internal
+        bitmap is left untouched.
+        
+        force:
+        Same as for commit()
+        """
+        
+        self.flush_pipeline()
+        if self.retained or self.committed_fb is None or \
+        self.committed_base is None:
+            return self.commit(force)
+        
+        self.scene.render_changed(self)
+        if not self.scene.dirty and not force:
+            return None
+        frame = self.committed_fb.copy()
+        if self.scene.dirty:
+            self.scene.composite_region(frame,
+                merge_bboxes(self.scene.dirty), self.committed_base)
+        # The dirty areas are kept, since the internal bitmap
+        # doesn't contain the scene yet
+        return self._commit_frame(frame, force)
+    
+    def _commit_frame(self, frame, force):
+        """
+        Send a bitmap other than the internal one and remember it
+        as the one shown by the display, see commit_regions().
+        
+        frame:
+        The framebuffer to send
+        
+        force:
+        Same as for commit()
+        """
+        
+        fb, self.fb = self.fb, frame
+        try:
+            message = self.encode()
+            if message is None:
+                return None
+            digest = hashlib.sha1(message).digest()
+            last_digest = self.manager.frame_digests.get(self.port)
+            if not force and last_digest == digest:
+                self.skipped_commits += 1
+                return None
+            if not force and last_digest is not None:
+                update = self.encode_update(self.committed_fb)
+                if update is not None:
+                    message = update
+            status = self._send_bitmap(message, digest)
+            self.committed_fb = frame
+        finally:
+            self.fb = fb
+            self._sync_pipeline()
+        return status
+    
+    def transition(self, effect = 'wipe', steps = 8, interval = 0.05,
+            **kwargs):
+        """
+        Change from the bitmap shown by the display to the internal bitmap
+        using a transition effect, then behave like commit().
+        All frames are encoded before the first one is sent, so they are
+        sent at regular intervals no matter how long rendering takes.
+        
+        effect:
+        The name of the effect (wipe, push, scroll_in, dissolve or
+        flip_columns)
+        
+        steps:
+        The number of frames
+        
+        interval:
+        The time between two frames in seconds
+        
+        kwargs:
+        Options for the effect, see the transitions module
+        """
+        
+        if effect not in EFFECTS:
+            raise ValueError("Unknown transition effect '{0}'".format(effect))
+        if self.pipeline is not None:
+            self.pipeline.flush()
+        self.render()
+        shown = self.committed_fb is not None and \
+            self.manager.frame_digests.get(self.port) is not None
+        if shown:
+            old = self.committed_fb
+        else:
+            # What the display shows is unknown, start from a blank bitmap
+            old = Framebuffer(self.bitmap_width, self.bitmap_height)
+        frames = EFFECTS[effect](old, self.fb, steps, **kwargs)
+        
+        messages = []
+        fb = self.fb
+        try:
+            previous = old if shown else None
+            for frame in frames:
+                self.fb = frame
+                message = None
+                if previous is not None:
+                    message = self.encode_update(previous)
+                if message is None:
+                    message = self.encode()
+                # The encoded message lives in a shared buffer
+                messages.append(bytes(message))
+                previous = frame
+        finally:
+            self.fb = fb
+        digest = hashlib.sha1(self.encode()).digest()
+        
+        start = time.monotonic()
+        try:
+            for index, message in enumerate(messages):
+                delay = start + index * interval - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                status = self._send_bitmap(message, digest)
+            self._store_committed()
+        finally:
+            self._sync_pipeline()
+        return status
+    
+    def scroll(self, speed = 20, mode = 'loop', gap = 0, step = 1,
+            cycles = 1, duration = None):
+        """
+        Scroll the internal bitmap across the display, for displays
+        that can't scroll on their own. The bitmap should be wider than
+        the display (see bitmap_width). Returns the number of frames sent.
+        Afterwards, the bitmap is cleared unless in retained mode.
+        
+        speed, mode, gap, step:
+        Same as for Scroller()
+        
+        cycles, duration:
+        Same as for Scroller.run()
+        """
+        
+        if self.pipeline is not None:
+            self.pipeline.flush()
+        self.render()
+        fb = self.fb
+        if fb.height != self.height:
+            fb = fb.crop(0, 0, fb.width, self.height)
+        scroller = Scroller(self, fb, speed, mode, gap, step)
+        try:
+            frames = scroller.run(cycles, duration)
+        finally:
+            self._sync_pipeline()
+        if not self.retained:
+            self.init_image()
+        return frames
+    
+    def animate(self, source, loops = 1, duration = None, **kwargs):
+        """
+        Play an animation on the display. All frames are decoded, placed,
+        converted and encoded before the first one is sent, and shown
+        at their time after the start. Frames the display can't keep up
+        with are dropped. Animation files are only encoded once for every
+        kind of display. Returns a dict with the number of frames shown
+        and dropped.
+        
+        source, duration:
+        Same as for load_frames()
+        
+        loops:
+        The number of times to play the animation
+        
+        kwargs:
+        Same as for bitmap(), used for every frame
+        """
+        
+        if self.pipeline is not None:
+            self.pipeline.flush()
+        key = None
+        animation = None
+        if isinstance(source, str):
+            path = os.path.abspath(source)
+            key = (path, os.stat(path).st_mtime, type(self),
+                self.bitmap_width, self.bitmap_height, duration,
+                repr(sorted(kwargs.items())))
+            animation = self.animation_cache.get(key)
+        
+        if animation is None:
+            animation = Animation(self, load_frames(source, duration),
+                **kwargs)
+            if key is not None:
+                self.animation_cache.put(key, animation, animation.nbytes)
+        try:
+            return animation.play(self, loops)
+        finally:
+            self._sync_pipeline()
+    
+    def start_ticker(self, text = "", font = None, size = 20,
+            color = 'white', speed = 20, step = 1, lookahead = None):
+        """
+        Start a ticker scrolling text across the display in the background.
+        More text can be appended with feed_ticker() while it is running.
+        Nothing should be committed until the ticker is stopped.
+        
+        text:
+        The text to start with
+        
+        font, size, color, speed, step, lookahead:
+        Same as for Ticker()
+        """
+        
+        self.stop_ticker()
+        if self.pipeline is not None:
+            self.pipeline.flush()
+        self.ticker = Ticker(self, font, size, color, speed, step, lookahead)
+        self.ticker.feed(text)
+        self.ticker.start()
+    
+    def feed_ticker(self, text):
+        """
+        Append text to the running ticker.
+        
+        text:
+        The text to append
+        """
+        
+        if self.ticker is None:
+            raise ValueError("No ticker is running")
+        self.ticker.feed(text)
+    
+    def stop_ticker(self):
+        """
+        Stop the running ticker.
+        """
+        
+        if self.ticker is not None:
+            self.ticker.stop()
+            self.ticker = None
+            self._sync_pipeline()
+    
+    def start_pipeline(self, depth = 2):
+        """
+        Commit bitmaps through a pipeline from now on. commit() then
+        returns as soon as the bitmap has been rendered, and the next one
+        can be drawn while it is encoded and sent in the background.
+        
+        depth:
+        The number of bitmaps that can wait for encoding or sending
+        before commit() blocks
+        """
+        
+        # A running pipeline is replaced, e.g. to change the depth
+        self.stop_pipeline()
+        self.pipeline = Pipeline(self, depth)
+    
+    def stop_pipeline(self):
+        """
+        Send the bitmaps still in the pipeline and commit directly again.
+        """
+        
+        if self.pipeline is None:
+            return
+        pipeline, self.pipeline = self.pipeline, None
+        pipeline.stop()
+    
+    def _sync_pipeline(self):
+        """
+        Let the pipeline know what the display shows after bitmaps were
+        sent without it, so it doesn't skip the next bitmap or base
+        a partial update on a bitmap the display doesn't show.
+        """
+        
+        if self.pipeline is not None:
+            self.pipeline.digest = self.manager.frame_digests.get(self.port)
+            self.pipeline.previous = self.committed_fb
+    
+    def flush_pipeline(self):
+        """
+        Wait until all committed bitmaps have been sent.
+        """
+        
+        if self.pipeline is not None:
+            self.pipeline.flush()
+    
+    def get_pipeline_stats(self):
+        """
+        Get the timing statistics of the pipeline stages,
+        or None if no pipeline is running.
+        """
+        
+        if self.pipeline is None:
+            return None
+        stats = self.pipeline.get_stats()
+        stats['status'] = self.pipeline.last_status
+        return stats
+    
+    def set_retained(self, state):
+        """
+        Enable or disable retained mode. In retained mode, the internal
+        bitmap is kept after a commit instead of being cleared, so only
+        the changed parts need to be redrawn before the next commit.
+        
+        state:
+        Whether retained mode should be enabled
+        """
+        
+        self.retained = bool(state)
+    
+    def set_element(self, name, func, *args, **kwargs):
+        """
+        Add a named element to the retained scene or replace an existing one.
+        Scene elements are drawn on top of the bitmap on every commit, but
+        only rendered again when they change. In retained mode, only
+        the area of changed elements is redrawn.
+        
+        name:
+        The name of the element
+        
+        func:
+        The drawing function to use (text, vertical_text, bitmap, line,
+        rectangle, binary_clock or analog_clock)
+        
+        args, kwargs:
+        The arguments for the drawing function
+        """
+        
+        self.scene.set(name, func, args, kwargs)
+    
+    def update_element(self, name, *args, **kwargs):
+        """
+        Change the arguments of a scene element. Without any arguments,
+        the element is just rendered again (e.g. to update a time string).
+        
+        name:
+        The name of the element
+        
+        args:
+        The new positional arguments for the drawing function
+        (the old ones are kept if none are given)
+        
+        kwargs:
+        The keyword arguments to change
+        """
+        
+        self.scene.update(name, args, kwargs)
+    
+    def remove_element(self, name):
+        """
+        Remove an element from the retained scene.
+        
+        name:
+        The name of the element
+        """
+        
+        self.scene.remove(name)
+    
+    def clear_elements(self):
+        """
+        Remove all elements from the retained scene.
+        """
+        
+        self.scene.clear()
+    
+    def set_region(self, name, area, interval, func, *args, **kwargs):
+        """
+        Add a region or replace an existing one. A region is a scene
+        element which is confined to an area of the display and rendered
+        again at regular intervals, e.g. a clock. Regions which are due
+        at the same time are composited and sent together.
+        
+        name:
+        The name of the region
+        
+        area:
+        The area of the region as (left, top, width, height).
+        Positions and alignments are relative to it.
+        
+        interval:
+        The number of seconds between two refreshes, counted from
+        midnight UTC (e.g. 60 means at every full minute)
+        or None to only refresh the region when it is updated
+        
+        func, args, kwargs:
+        Same as for set_element()
+        """
+        
+        self.scene.set(name, func, args, kwargs, tuple(area), interval)
+    
+    def refresh_regions(self, now = None):
+        """
+        Mark all regions which are due as changed so they are rendered
+        again on the next commit. Returns whether any region was due.
+        
+        now:
+        The current time as a UNIX timestamp (optional)
+        """
+        
+        return self.scene.refresh(now) > 0
+    
+    def get_next_refresh(self):
+        """
+        Get the UNIX timestamp of the next time a region is due,
+        or None if there are no regions with an interval.
+        """
+        
+        return self.scene.get_next_due()
+    
+    def add_layer(self, name, z = 0, static = False):
+        """
+        Add a layer or change the properties of an existing one.
+        Once a layer has been added, everything is drawn into the selected
+        layer (initially one called 'default' with z = 0 which contains
+        everything drawn so far) and the layers are composited on commit.
+        The composition is only done again if a layer has changed.
+        
+        name:
+        The name of the layer
+        
+        z:
+        The position of the layer in the stack, layers with higher values
+        are drawn on top of those with lower values
+        
+        static:
+        Whether the layer should be kept after a commit (e.g. for
+        backgrounds which don't change), otherwise it is cleared
+        """
+        
+        size = (self.bitmap_width, self.bitmap_height)
+        if not self.layers:
+            default = Layer(*size)
+            if self.fb.popcount():
+                default.paste(Sprite(self.fb.copy(), self.fb.copy()), 0, 0)
+            self.layers['default'] = default
+            self.active_layer = 'default'
+            self.layer_fb = Framebuffer(*size)
+        
+        if name in self.layers:
+            self.layers[name].z = z
+            self.layers[name].static = static
+        else:
+            self.layers[name] = Layer(*size, z = z, static = static)
+        self.layers_changed = True
+    
+    def remove_layer(self, name):
+        """
+        Remove a layer. If the last layer is removed, drawing is done
+        directly into the internal bitmap again.
+        
+        name:
+        The name of the layer
+        """
+        
+        del self.layers[name]
+        self.layers_changed = True
+        if not self.layers:
+            self.active_layer = None
+        elif self.active_layer == name:
+            self.active_layer = 'default' if 'default' in self.layers \
+                else next(iter(self.layers))
+    
+    def select_layer(self, name = 'default'):
+        """
+        Select the layer to draw into.
+        
+        name:
+        The name of the layer
+        """
+        
+        if name not in self.layers:
+            raise KeyError("No layer named '{0}'".format(name))
+        self.active_layer = name
+    
+    def clear_layer(self, name):
+        """
+        Make a layer completely transparent.
+        
+        name:
+        The name of the layer
+        """
+        
+        self.layers[name].clear()
+    
+    def capture(self, func, *args, area = None, **kwargs):
+        """
+        Call a drawing function, but return the sprites it would insert
+        as a list of tuples (sprite, x, y) instead of inserting them.
+        
+        func:
+        The name of the drawing function
+        
+        args, kwargs:
+        The arguments for the drawing function
+        
+        area:
+        The area to confine the sprites to as (left, top, width, height),
+        positions are relative to it
+        """
+        
+        self.captured = []
+        self.viewport = area
+        try:
+            getattr(self, func)(*args, **kwargs)
+            captured = self.captured
+        finally:
+            self.captured = None
+            self.viewport = None
+        if area is None:
+            return captured
+        
+        left, top, width, height = area
+        region = (left, top, left + width, top + height)
+        clipped = [clip_sprite(sprite, x, y, region)
+            for sprite, x, y in captured]
+        return [item for item in clipped if item is not None]
+    
+    def draw(self, ops):
+        """
+        Execute a list of drawing operations at once.
+        Every operation is a list consisting of the name of a drawing
+        function (the same ones as for scene elements), its positional
+        arguments and optionally a dict of keyword arguments, e.g.
+        ["text", "12:00", {"font": "Luminator16_Bold", "left": 1}].
+        Operations which lie completely outside of the bitmap are skipped.
+        A failing operation doesn't stop the others from being executed.
+        Returns a dict with the number of drawn and skipped operations
+        and a list of errors as [index, message].
+        
+        ops:
+        The list of operations
+        """
+        
+        return self.summarize_ops(self.run_ops(ops))
+
+    def run_ops(self, ops):
+        """
+        Execute a list of drawing operations.
+        Returns the outcome of every operation: True if it was drawn,
+        False if it was skipped or the error message if it failed.
+        
+        ops:
+        The list of operations, see draw()
+        """
+        
+        outcomes = []
+        for op in ops:
+            try:
+                func, args, kwargs = self._parse_op(op)
+                if self._is_culled(func, args, kwargs):
+                    outcomes.append(False)
+                    continue
+                getattr(self, func)(*args, **kwargs)
+            except Exception as exc:
+                outcomes.append("{0}: {1}".format(type(exc).__name__, exc))
+            else:
+                outcomes.append(True)
+        return outcomes
+
+    def summarize_ops(self, outcomes):
+        """
+        Build the result of draw() from the outcomes of the operations.
+        
+        outcomes:
+        The outcomes as returned by run_ops()
+        """
+        
+        errors = [[index, outcome] for index, outcome in enumerate(outcomes)
+            if isinstance(outcome, str)]
+        return {
+            'drawn': outcomes.count(True),
+            'culled': outcomes.count(False),
+            'errors': errors
+        }
+
+    def _parse_op(self, op):
+        """
+        Split a drawing operation into the name of the function,
+        its positional arguments and its keyword arguments.
+        
+        op:
+        The operation, see draw()
+        """
+        
+        if not op or not isinstance(op[0], str):
+            raise ValueError("Invalid drawing operation: {0!r}".format(op))
+        func, args = op[0], list(op[1:])
+        if func not in Scene.FUNCS:
+            raise ValueError("'{0}' cannot be used for drawing operations"
+                .format(func))
+        kwargs = args.pop() if args and isinstance(args[-1], dict) else {}
+        return func, args, kwargs
+
+    def _is_culled(self, func, args, kwargs):
+        """
+        Check whether a drawing operation certainly lies outside
+        of the bitmap without executing it.
+        
+        func, args, kwargs:
+        The parsed operation, see _parse_op()
+        """
+        
+        if func in ('line', 'rectangle'):
+            points = kwargs.get('points', args[0] if args else None)
+            coords = list(self._flatten_points(points))
+            if not coords:
+                return False
+            margin = kwargs.get('width', 1) if func == 'line' else 0
+            xs, ys = coords[0::2], coords[1::2]
+            return max(xs) + margin < 0 or max(ys) + margin < 0 or \
+                min(xs) - margin >= self.bitmap_width or \
+                min(ys) - margin >= self.bitmap_height
+        
+        # The size of everything else is only known after rendering it,
+        # but edges positioned outside of the bitmap are enough
+        left, top = kwargs.get('left'), kwargs.get('top')
+        right, bottom = kwargs.get('right'), kwargs.get('bottom')
+        return (left is not None and left >= self.bitmap_width) or \
+            (top is not None and top >= self.bitmap_height) or \
+            (right is not None and right < 0) or \
+            (bottom is not None and bottom < 0)
+
+    def _flatten_points(self, points):
+        """
+        Iterate over the coordinates of points given either as
+        [x0, y0, x1, y1, ...] or as [(x0, y0), (x1, y1), ...].
+        
+        points:
+        The points
+        """
+        
+        for point in points or ():
+            if isinstance(point, (list, tuple)):
+                yield from point
+            else:
+                yield point
+
+    def get_cache_stats(self):
+        """
+        Get the statistics of the caches used for rendering.
+        """
+        
+        return {
+            'text': self.text_cache.get_stats(),
+            'glyphs': self.glyph_cache.get_stats(),
+            'assets': self.asset_cache.get_stats(),
+            'metrics': self.metrics_cache.get_stats(),
+            'frame_tables': self.frame_tables.get_stats(),
+            'animations': self.animation_cache.get_stats()
+        }
     
     def get_bitmap(self):
         """
@@ -74,24 +1066,138 @@ class BitmapDisplay(BaseDisplay):
         boolean for every pixel in that column (top to bottom).
         """
         
-        pixels = self.img.load()
-        width, height = self.img.size
-        bitmap = []
-        for x in range(width):
-            column = []
-            for y in range(height):
-                column.append(pixels[x, y] > 127)
-            bitmap.append(column)
-        return bitmap
+        self.render()
+        return self.fb.get_columns()
+    
+    def _get_color(self, color):
+        """
+        Convert a color into a pixel state.
+        
+        color:
+        A color name or an 8-bit grayscale value
+        """
+        
+        if isinstance(color, str):
+            color = ImageColor.getcolor(color, 'L')
+        return color > 127
+    
+    def _get_position(self, bwidth, bheight, halign = None, valign = None,
+            left = None, center = None, right = None, top = None,
+            middle = None, bottom = None):
+        """
+        Calculate the position of the upper left corner of a bitmap.
+        
+        bwidth:
+        The width of the bitmap
+        
+        bheight:
+        The height of the bitmap
+        
+        halign, valign, left, center, right, top, middle, bottom:
+        Same as for bitmap()
+        """
+        
+        halign = halign or 'center'
+        valign = valign or 'middle'
+        if self.viewport is None:
+            area_left, area_top, width, height = 0, 0, self.width, self.height
+        else:
+            area_left, area_top, width, height = self.viewport
+
+        if left is not None:
+            bitmapx = left
+        elif center is not None:
+            bitmapx = round(center - (bwidth/2))
+        elif right is not None:
+            bitmapx = right - bwidth + 1
+        else:
+            if halign == 'center':
+                bitmapx = round((width - bwidth) / 2)
+            elif halign == 'right':
+                bitmapx = width - bwidth
+            else:
+                bitmapx = 0
+
+        if top is not None:
+            bitmapy = top
+        elif middle is not None:
+            bitmapy = round(middle - (bheight/2))
+        elif bottom is not None:
+            bitmapy = bottom - bheight + 1
+        else:
+            if valign == 'middle':
+                bitmapy = round((height - bheight) / 2)
+            elif valign == 'bottom':
+                bitmapy = height - bheight
+            else:
+                bitmapy = 0
+
+        return bitmapx + area_left, bitmapy + area_top
+    
+    def _paste(self, sprite, x, y):
+        """
+        Insert a sprite into the internal bitmap.
+        
+        sprite:
+        The sprite to insert
+        
+        x:
+        The x position of the left edge of the sprite
+        
+        y:
+        The y position of the top edge of the sprite
+        """
+        
+        if x >= self.bitmap_width or y >= self.bitmap_height or \
+                x + sprite.width <= 0 or y + sprite.height <= 0:
+            # Completely outside of the bitmap
+            return
+        if self.captured is not None:
+            self.captured.append((sprite, x, y))
+        elif self.layers:
+            self.layers[self.active_layer].paste(sprite, x, y)
+        else:
+            self.fb.blit(sprite.pixels, x, y, sprite.mask)
+            if self.scene.composited and self.scene_base is not None:
+                # Keep the drawing when the scene is composited again
+                self.scene_base.blit(sprite.pixels, x, y, sprite.mask)
+    
+    def _draw_shape(self, func, *args, color = 'white', **kwargs):
+        """
+        Draw a shape onto the internal bitmap using PIL.
+        
+        func:
+        The name of the ImageDraw method to use
+        
+        color:
+        Same as for text()
+        
+        args, kwargs:
+        Passed on to the ImageDraw method
+        """
+        
+        getattr(self.shape_draw, func)(*args, **kwargs)
+        bbox = self.shape_img.getbbox()
+        if bbox is None:
+            return
+        
+        # Only process the area the shape was drawn into
+        mask = Framebuffer.from_image(self.shape_img.crop(bbox))
+        self.shape_img.paste(0, bbox)
+        x, y = bbox[0], bbox[1]
+        if self.viewport is not None:
+            x += self.viewport[0]
+            y += self.viewport[1]
+        self._paste(Sprite.from_mask(mask, self._get_color(color)), x, y)
     
     def bitmap(self, image, halign = None, valign = None, left = None,
             center = None, right = None, top = None, middle = None,
-            bottom = None, angle = 0):
+            bottom = None, angle = 0, size = None, dither = None):
         """
         Insert a bitmap.
         
         image:
-        The bitmap to insert
+        The bitmap to insert (file path, PIL image or Sprite)
         
         halign:
         The align of the bitmap on the horizontal axis (left, center, right)
@@ -120,52 +1226,99 @@ class BitmapDisplay(BaseDisplay):
         angle:
         The angle in degrees to rotate the image
         (counterclockwise around its center point)
+        
+        size:
+        The maximum size of the bitmap as (width, height), either can be
+        None. The bitmap is scaled to fit, keeping its aspect ratio.
+        
+        dither:
+        The method for converting the bitmap to black and white
+        ('threshold', 'bayer', 'floyd-steinberg' or 'atkinson').
+        If neither size nor dither are specified, the bitmap is inserted
+        as it is (pixels brighter than 127 are set).
         """
         
-        halign = halign or 'center'
-        valign = valign or 'middle'
-        if isinstance(image, Image.Image):
+        if size is not None or dither is not None:
+            sprite = self._convert_bitmap(image, angle, size,
+                dither or 'threshold')
+        elif isinstance(image, Sprite):
+            sprite = image
+            if angle:
+                sprite = Sprite.from_image(
+                    sprite.to_image().rotate(angle, expand = True))
+        elif isinstance(image, Image.Image):
             img = image
+            if angle:
+                img = img.rotate(angle, expand = True)
+            sprite = Sprite.from_image(img)
         else:
-            img = Image.open(image).convert('RGBA')
+            sprite = self._load_bitmap(image, angle)
 
+        x, y = self._get_position(sprite.width, sprite.height, halign,
+            valign, left, center, right, top, middle, bottom)
+        self._paste(sprite, x, y)
+
+    def _load_bitmap(self, path, angle = 0):
+        """
+        Load a bitmap file into a sprite or get it from the asset cache.
+        Cached files are reloaded when their modification time changes.
+        
+        path:
+        The path of the bitmap file
+        
+        angle:
+        Same as for bitmap()
+        """
+        
+        path = os.path.abspath(path)
+        key = (path, os.stat(path).st_mtime, angle)
+        sprite = self.asset_cache.get(key)
+        if sprite is not None:
+            return sprite
+        
+        img = Image.open(path).convert('RGBA')
         if angle:
             img = img.rotate(angle, expand = True)
+        sprite = Sprite.from_image(img)
+        self.asset_cache.put(key, sprite, sprite.nbytes)
+        return sprite
 
-        bwidth, bheight = img.size
-
-        if left is not None:
-            bitmapx = left
-        elif center is not None:
-            bitmapx = round(center - (bwidth/2))
-        elif right is not None:
-            bitmapx = right - bwidth + 1
-        else:
-            if halign == 'center':
-                bitmapx = round((self.width - bwidth) / 2)
-            elif halign == 'right':
-                bitmapx = self.width - bwidth
-            else:
-                bitmapx = 0
-
-        if top is not None:
-            bitmapy = top
-        elif middle is not None:
-            bitmapy = round(middle - (bheight/2))
-        elif bottom is not None:
-            bitmapy = bottom - bheight + 1
+    def _convert_bitmap(self, image, angle, size, method):
+        """
+        Scale and dither a bitmap or get it from the asset cache.
+        
+        image, angle, size:
+        Same as for bitmap()
+        
+        method:
+        The dithering method, see bitmap()
+        """
+        
+        if isinstance(image, Sprite):
+            image = image.to_image()
+        if isinstance(image, Image.Image):
+            digest = hashlib.sha1(image.tobytes())
+            if image.palette is not None:
+                digest.update(bytes(image.getpalette()))
+            key = (digest.digest(), image.mode, image.size)
         else:
-            if valign == 'middle':
-                bitmapy = round((self.height - bheight) / 2)
-            elif valign == 'bottom':
-                bitmapy = self.height - bheight
-            else:
-                bitmapy = 0
-
-        self.img.paste(img, (bitmapx, bitmapy), img)
+            path = os.path.abspath(image)
+            key = (path, os.stat(path).st_mtime)
+        key += (angle, tuple(size) if size else None, method)
+        sprite = self.asset_cache.get(key)
+        if sprite is not None:
+            return sprite
+        
+        img = image if isinstance(image, Image.Image) else Image.open(image)
+        if angle:
+            img = img.convert('RGBA').rotate(angle, expand = True)
+        sprite = convert_image(img, size, method)
+        self.asset_cache.put(key, sprite, sprite.nbytes)
+        return sprite
 
     def text(self, text, font = None, size = 20, color = 'white',
-            timestring = False, **kwargs):
+            timestring = False, box = None, fit = 'shrink',
+            fallback_fonts = None, min_size = 6, ellipsis = "...", **kwargs):
         """
         Insert a text.
         
@@ -185,6 +1338,26 @@ class BitmapDisplay(BaseDisplay):
         timestring:
         Whether the text should be parsed as a time format string
         
+        box:
+        The maximum size of the text as (width, height), either can be None.
+        If the text doesn't fit, it is changed according to fit.
+        
+        fit:
+        A policy or a list of policies for fitting the text into the box,
+        applied in this order:
+        'shrink': Reduce the size of truetype fonts down to min_size
+        'fallback': Try the fonts in fallback_fonts (narrowest last)
+        'ellipsize': Shorten the text and append the ellipsis
+        
+        fallback_fonts:
+        The fonts to try if the text doesn't fit using the given font
+        
+        min_size:
+        The smallest size to shrink truetype fonts to
+        
+        ellipsis:
+        The string to append to shortened texts
+        
         kwargs:
         Same as for bitmap()
         """
@@ -192,13 +1365,113 @@ class BitmapDisplay(BaseDisplay):
         font = font or self.DEFAULT_FONT
         if timestring:
             text = datetime.datetime.strftime(datetime.datetime.now(), text)
+        if box is not None:
+            text, font, size = self._fit_text(text, font, size, color, box,
+                fit, fallback_fonts, min_size, ellipsis)
+
+        self.bitmap(self._render_text(text, font, size, color), **kwargs)
+
+    def _get_metrics(self, font, size):
+        """
+        Get the character measurements of a font from the metrics cache.
+        
+        font, size:
+        Same as for text()
+        """
+        
+        key = (font, size)
+        metrics = self.metrics_cache.get(key)
+        if metrics is None:
+            metrics = FontMetrics(*self.font_handler.get_imagefont(font, size))
+            self.metrics_cache.put(key, metrics)
+        return metrics
+
+    def _fit_text(self, text, font, size, color, box, fit, fallback_fonts,
+            min_size, ellipsis):
+        """
+        Find a font and size for a text so that it fits into a box,
+        shortening the text if necessary.
+        The search only uses the cached measurements of the characters.
+        Since these don't include the kerning of truetype fonts, the result
+        is checked by rendering it (the rendered text is cached for drawing
+        it afterwards). Returns a tuple (text, font, size).
+        
+        text, font, size, color, box, fit, fallback_fonts, min_size, ellipsis:
+        Same as for text()
+        """
+        
+        if isinstance(fit, str):
+            fit = (fit, )
+        for policy in fit:
+            if policy not in self.FIT_POLICIES:
+                raise ValueError("Unknown fit policy '{0}'".format(policy))
+        max_width, max_height = box
+
+        def _fits(text, font, size, rendered = False):
+            metrics = self._get_metrics(font, size)
+            if rendered and metrics.truetype and text.strip():
+                width, height = self._render_text(text, font, size,
+                    color).size
+            else:
+                width, height = metrics.get_size(text)
+            return (max_width is None or width <= max_width) and \
+                (max_height is None or height <= max_height)
+
+        fonts = [font]
+        if 'fallback' in fit:
+            fonts.extend(fallback_fonts or [])
+        for font in fonts:
+            if _fits(text, font, size) and _fits(text, font, size, True):
+                return text, font, size
+            truetype = self._get_metrics(font, size).truetype
+            if 'shrink' in fit and truetype and size > min_size:
+                # Find the largest size that fits
+                low, high = min_size - 1, size - 1
+                while low < high:
+                    middle = (low + high + 1) // 2
+                    if _fits(text, font, middle):
+                        low = middle
+                    else:
+                        high = middle - 1
+                while low >= min_size and not _fits(text, font, low, True):
+                    low -= 1
+                if low >= min_size:
+                    return text, font, low
+
+        if 'ellipsize' in fit and max_width is not None:
+            # Shorten the text using the last font, as small as allowed
+            if 'shrink' in fit and truetype:
+                size = min(size, min_size)
+            low, high = 0, len(text)
+            while low < high:
+                middle = (low + high + 1) // 2
+                if _fits(text[:middle] + ellipsis, font, size):
+                    low = middle
+                else:
+                    high = middle - 1
+            while low > 0 and not _fits(text[:low].rstrip() + ellipsis,
+                    font, size, True):
+                low -= 1
+            text = text[:low].rstrip() + ellipsis
+        return text, font, size
+
+    def _render_text(self, text, font, size, color):
+        """
+        Render a text into a sprite or get it from the text cache.
+        
+        text, font, size, color:
+        Same as for text()
+        """
+        
+        key = (text, font, size, color)
+        sprite = self.text_cache.get(key)
+        if sprite is not None:
+            return sprite
 
         textfont, truetype = self.font_handler.get_imagefont(font, size)
         approx_tsize = textfont.getsize(text)
-        text_img = Image.new('RGBA', approx_tsize, (0, 0, 0, 0))
-        text_draw = ImageDraw.Draw(text_img)
-        text_draw.fontmode = "1"
-        text_draw.text((0, 0), text, color, font = textfont)
+        text_img = Image.new('1', approx_tsize, 0)
+        ImageDraw.Draw(text_img).text((0, 0), text, 1, font = textfont)
         if truetype:
             # font.getsize is inaccurate on non-pixel fonts
             text_img = text_img.crop(text_img.getbbox())
@@ -206,7 +1479,69 @@ class BitmapDisplay(BaseDisplay):
             # only crop horizontally with pixel fonts
             bbox = text_img.getbbox()
             text_img = text_img.crop((bbox[0], 0, bbox[2], text_img.size[1]))
-        self.bitmap(text_img, **kwargs)
+        sprite = Sprite.from_mask(Framebuffer.from_image(text_img),
+            self._get_color(color))
+        self.text_cache.put(key, sprite, sprite.nbytes)
+        return sprite
+
+    def paragraph(self, text, font = None, size = 20, color = 'white',
+            width = None, line_spacing = 1, align = 'left', max_lines = None,
+            timestring = False, **kwargs):
+        """
+        Insert a text spanning multiple lines, broken at spaces
+        so that no line is wider than the given width.
+        
+        text:
+        The text to insert (line breaks are kept)
+        
+        font, size, color, timestring:
+        Same as for text()
+        
+        width:
+        The width of the paragraph (the width of the bitmap if not specified)
+        
+        line_spacing:
+        The number of blank pixels between two lines
+        
+        align:
+        The align of the lines within the paragraph (left, center, right)
+        
+        max_lines:
+        The maximum number of lines, further lines are left out
+        
+        kwargs:
+        Same as for bitmap()
+        """
+        
+        if align not in ('left', 'center', 'right'):
+            raise ValueError("Invalid align '{0}'".format(align))
+        font = font or self.DEFAULT_FONT
+        width = width or self.bitmap_width
+        if timestring:
+            text = datetime.datetime.strftime(datetime.datetime.now(), text)
+
+        metrics = self._get_metrics(font, size)
+        lines = metrics.wrap(text, width)[:max_lines]
+        step = metrics.line_height + line_spacing
+        pixels = Framebuffer(width, max(1, len(lines) * step - line_spacing))
+        mask = Framebuffer(*pixels.size)
+        for index, line in enumerate(lines):
+            if not line.strip():
+                continue
+            sprite = self._render_text(line, font, size, color)
+            if align == 'left':
+                x = 0
+            elif align == 'center':
+                x = (width - sprite.width) // 2
+            else:
+                x = width - sprite.width
+            y = index * step
+            if metrics.truetype:
+                # Truetype texts are cropped vertically as well
+                y += min(metrics.get_char(char)[3] for char in line)
+            pixels.blit(sprite.pixels, x, y, sprite.mask)
+            mask.blit(sprite.mask, x, y, sprite.mask)
+        self.bitmap(Sprite(pixels, mask), **kwargs)
 
     def vertical_text(self, text, font = None, size = 20, char_align = 'center',
             spacing = 2, color = 'white', timestring = False, **kwargs):
@@ -230,48 +1565,74 @@ class BitmapDisplay(BaseDisplay):
         if timestring:
             text = datetime.datetime.strftime(datetime.datetime.now(), text)
 
-        textfont, truetype = self.font_handler.get_imagefont(font, size)
-        char_imgs = []
-        for char in text:
-            approx_csize = textfont.getsize(char)
-            # Generate separate image for char (so size can be accurately
-            # determined, as opposed to font.getsize)
-            char_img = Image.new('RGBA', approx_csize, (0, 0, 0, 0))
-            char_draw = ImageDraw.Draw(char_img)
-            char_draw.fontmode = "1"
-            char_draw.text((0, 0), char, color, font = textfont)
-            char_img = char_img.rotate(90, expand = True)
-            char_img = char_img.crop(char_img.getbbox())
-            char_imgs.append(char_img)
+        glyphs = [self._render_glyph(char, font, size, color)
+            for char in text]
         
         # Width and height are treated looking at the non-rotated matrix
-        # from here on        
-        twidth, theight = 0, 0
-        # Add the spacing to text width
-        twidth += spacing * len(char_imgs) - 1
-        for char_img in char_imgs:
-            cwidth, cheight = char_img.size
-            # Text width is the width of the widest char, text height is
-            # the sum of char heights plus spacing
-            if cheight > theight:
-                theight = cheight
-            twidth += cwidth
-        
-        text_img = Image.new('RGBA', (twidth, theight), (0, 0, 0, 0))
-        xpos = 0
-        for i, char_img in enumerate(char_imgs):
-            cwidth, cheight = char_img.size
-
+        # from here on.
+        # Text width is the sum of char widths plus spacing,
+        # text height is the height of the widest char
+        twidth = spacing * len(glyphs) - 1 + sum(g.width for g in glyphs)
+        theight = max((g.height for g in glyphs), default = 0)
+        
+        # Rotating is done on the whole text, so it has to be assembled first
+        angle = kwargs.pop('angle', 0)
+        if angle:
+            pixels = Framebuffer(twidth, theight)
+            mask = Framebuffer(twidth, theight)
+            left, top = 0, 0
+        else:
+            # Insert the chars directly
+            left, top = self._get_position(twidth, theight, **kwargs)
+        
+        xpos = left
+        for glyph in glyphs:
             if char_align == 'center':
-                ypos = int((theight - cheight) / 2)
+                ypos = int((theight - glyph.height) / 2)
             elif char_align == 'right':
                 ypos = 0
             else:
-                ypos = theight - cheight
+                ypos = theight - glyph.height
             
-            text_img.paste(char_img, (xpos, ypos), char_img)
-            xpos += cwidth + spacing
-        self.bitmap(text_img, **kwargs)
+            if angle:
+                pixels.blit(glyph.pixels, xpos, ypos, glyph.mask)
+                mask.blit(glyph.mask, xpos, ypos, glyph.mask)
+            else:
+                self._paste(glyph, xpos, top + ypos)
+            xpos += glyph.width + spacing
+        
+        if angle:
+            self.bitmap(Sprite(pixels, mask), angle = angle, **kwargs)
+
+    def _render_glyph(self, char, font, size, color):
+        """
+        Render a single char rotated by 90 degrees for vertical_text()
+        or get it from the glyph cache.
+        
+        char:
+        The char to render
+        
+        font, size, color:
+        Same as for text()
+        """
+        
+        key = (char, font, size, color)
+        sprite = self.glyph_cache.get(key)
+        if sprite is not None:
+            return sprite
+        
+        textfont, truetype = self.font_handler.get_imagefont(font, size)
+        approx_csize = textfont.getsize(char)
+        # Generate separate image for char (so size can be accurately
+        # determined, as opposed to font.getsize)
+        char_img = Image.new('1', approx_csize, 0)
+        ImageDraw.Draw(char_img).text((0, 0), char, 1, font = textfont)
+        char_img = char_img.rotate(90, expand = True)
+        char_img = char_img.crop(char_img.getbbox())
+        sprite = Sprite.from_mask(Framebuffer.from_image(char_img),
+            self._get_color(color))
+        self.glyph_cache.put(key, sprite, sprite.nbytes)
+        return sprite
 
     def line(self, points, color = 'white', width = 1):
         """
@@ -288,7 +1649,8 @@ class BitmapDisplay(BaseDisplay):
         The width of the line
         """
         
-        self.draw.line(points, fill = color, width = width)
+        self._draw_shape('line', points, fill = 1, width = width,
+            color = color)
 
     def rectangle(self, points, color = 'white', fill = False):
         """
@@ -305,26 +1667,69 @@ class BitmapDisplay(BaseDisplay):
         Whether to draw a filled or an outlined rectangle
         """
         
-        self.draw.rectangle(points, fill = color if fill else None,
-            outline = color)
+        self._draw_shape('rectangle', points, fill = 1 if fill else None,
+            outline = 1, color = color)
 
     def clear(self):
         """
         Clear the entire bitmap. (Similar to init_image)
+        If layers are used, the selected layer is made transparent.
         """
         
-        img = Image.new('RGBA', (self.bitmap_width, self.bitmap_height),
-            'black')
-        self.bitmap(img)
+        if self.layers:
+            self.layers[self.active_layer].clear()
+        else:
+            self.fb.clear()
+            self.scene.composited = False
 
     def fill(self):
         """
         Fill the entire bitmap with white.
+        If layers are used, only the selected layer is filled.
+        """
+        
+        if self.layers:
+            self.layers[self.active_layer].fill()
+        else:
+            self.fb.fill()
+            self.scene.composited = False
+
+    def _get_frame_table(self, name, params, count, render, masked = False):
         """
+        Get the frame table of a widget from the cache,
+        creating it if necessary.
+        
+        name:
+        The name of the widget
+        
+        params:
+        A tuple of the parameters which determine the appearance
+        of the widget, passed to render after the frame index
+        
+        count:
+        The number of frames
+        
+        render:
+        The function rendering a single frame
         
-        img = Image.new('RGBA', (self.bitmap_width, self.bitmap_height),
-            'white')
-        self.bitmap(img)
+        masked:
+        Same as for FrameTable()
+        """
+        
+        key = (name, ) + params
+        table = self.frame_tables.get(key)
+        if table is not None:
+            return table
+        
+        width, height = render(0, *params).size
+        path = None
+        if self.FRAME_TABLE_DIR is not None:
+            path = os.path.join(self.FRAME_TABLE_DIR, "{0}_{1}.bin".format(
+                name, "_".join(str(param) for param in params)))
+        table = FrameTable(width, height, count,
+            lambda index: render(index, *params), masked, path)
+        self.frame_tables.put(key, table)
+        return table
 
     def binary_clock(self, block_width = 3, block_height = 3,
             block_spacing_x = 1, block_spacing_y = 1, **kwargs):
@@ -347,27 +1752,41 @@ class BitmapDisplay(BaseDisplay):
         Same as for bitmap()
         """
         
+        now = datetime.datetime.now()
+        params = (block_width, block_height, block_spacing_x, block_spacing_y)
+        table = self._get_frame_table('binary_clock', params, 24 * 60,
+            self._render_binary_clock)
+        self.bitmap(table.get(now.hour * 60 + now.minute), **kwargs)
+
+    def _render_binary_clock(self, index, block_width, block_height,
+            block_spacing_x, block_spacing_y):
+        """
+        Render a single frame of a binary clock.
+        
+        index:
+        The minute of the day to render
+        
+        block_width, block_height, block_spacing_x, block_spacing_y:
+        Same as for binary_clock()
+        """
+        
         width = 6*block_width + 5*block_spacing_x
         height = 2*block_height + block_spacing_y
-        img = Image.new('RGBA', (width, height), 'black')
-        draw = ImageDraw.Draw(img)
-        now = datetime.datetime.now()
-        hour_bits = [now.hour >> i & 1 for i in range(7, -1, -1)][-6:]
-        minute_bits = [now.minute >> i & 1 for i in range(7, -1, -1)][-6:]
+        pixels = Framebuffer(width, height)
+        hour, minute = divmod(index, 60)
+        hour_bits = [hour >> i & 1 for i in range(7, -1, -1)][-6:]
+        minute_bits = [minute >> i & 1 for i in range(7, -1, -1)][-6:]
         
-        y = 0
-        for pos, bit in enumerate(hour_bits):
-            x = pos * (block_width + block_spacing_x)
-            draw.rectangle((x, y, x + block_width-1, y + block_height-1),
-                outline = 'white', fill = 'white' if bit else 'black')
-
-        y = block_height + block_spacing_y
-        for pos, bit in enumerate(minute_bits):
-            x = pos * (block_width + block_spacing_x)
-            draw.rectangle((x, y, x + block_width-1, y + block_height-1),
-                outline = 'white', fill = 'white' if bit else 'black')
-
-        self.bitmap(img, **kwargs)
+        for y, bits in ((0, hour_bits),
+                (block_height + block_spacing_y, minute_bits)):
+            for pos, bit in enumerate(bits):
+                x = pos * (block_width + block_spacing_x)
+                # Outlined block, filled if the bit is set
+                pixels.fill_rect(x, y, x + block_width-1, y + block_height-1)
+                if not bit:
+                    pixels.fill_rect(x + 1, y + 1, x + block_width-2,
+                        y + block_height-2, False)
+        return pixels
 
     def analog_clock(self, width = 16, height = 16, **kwargs):
         """
@@ -383,6 +1802,22 @@ class BitmapDisplay(BaseDisplay):
         Same as for bitmap()
         """
         
+        now = datetime.datetime.now()
+        table = self._get_frame_table('analog_clock', (width, height),
+            12 * 60, self._render_analog_clock, masked = True)
+        self.bitmap(table.get(now.hour % 12 * 60 + now.minute), **kwargs)
+
+    def _render_analog_clock(self, index, width, height):
+        """
+        Render a single frame of an analog clock.
+        
+        index:
+        The minute of the half day to render
+        
+        width, height:
+        Same as for analog_clock()
+        """
+        
         def rect(r, theta):
             """
             Convert polar coordinates into rectangular coordinates.
@@ -417,23 +1852,23 @@ class BitmapDisplay(BaseDisplay):
             return (a*b) / math.sqrt(
                 a**2 * math.sin(angle)**2 + b**2 * math.cos(angle)**2)
 
-        img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+        img = Image.new('1', (width, height), 0)
         draw = ImageDraw.Draw(img)
-        now = datetime.datetime.now()
-        draw.rectangle((0, 0, width-1, height-1), outline = 'white')
+        hour, minute = divmod(index, 60)
+        draw.rectangle((0, 0, width-1, height-1), outline = 1)
         center = (width/2, height/2)
 
-        hour_angle = (now.hour % 12) * 360/12 + now.minute * 360/(12*60) - 90
+        hour_angle = hour * 360/12 + minute * 360/(12*60) - 90
         hour_length = ellipse_radius(width/2, height/2, hour_angle) * 0.3
         hour_hand = rect(hour_length, hour_angle)
         draw.line((center, (hour_hand[0]+center[0], hour_hand[1]+center[1])),
-            fill = 'white')
+            fill = 1)
 
-        minute_angle = now.minute * 360/60 - 90
+        minute_angle = minute * 360/60 - 90
         minute_length = ellipse_radius(width/2, height/2, minute_angle) * 0.8
         minute_hand = rect(minute_length, minute_angle)
         draw.line((center,
             (minute_hand[0]+center[0], minute_hand[1]+center[1])),
-            fill = 'white')
+            fill = 1)
 
-        self.bitmap(img, **kwargs)
\ No newline at end of file
+        return Framebuffer.from_image(img)
\ No newline at end of file
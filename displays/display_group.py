@@ -0,0 +1,169 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the code for groups of displays showing the same content.
+"""
+
+import hashlib
+
+from .scene import Scene
+
+class DisplayGroup:
+    """
+    A group of bitmap displays which show the same content.
+    Drawing functions called on the group are recorded and executed once
+    for every distinct kind of display (same class and size) in the group.
+    The encoded bitmap is then sent to every display of that kind.
+    Displays of a different size get their own layout, e.g. centered texts
+    are centered on every display.
+    All other functions are called on every display of the group.
+    """
+
+    # Drawing functions which are recorded
+    DRAW_FUNCS = Scene.FUNCS + ('clear', 'fill')
+
+    def __init__(self, name = None):
+        """
+        name:
+        A name to identify the group
+        """
+
+        self.name = name
+        # Groups aren't connected to a port themselves
+        self.port = None
+        self.members = []
+        # The recorded drawing operations, see BitmapDisplay.draw()
+        self.ops = []
+
+    def __str__(self):
+        return "Display Group '{name}' ({count} displays)".format(
+            name = self.name, count = len(self.members))
+
+    def __getattr__(self, key):
+        """
+        Record calls to drawing functions and pass all other calls
+        on to the displays of the group.
+        """
+
+        if key.startswith('_'):
+            raise AttributeError(key)
+        if key in self.DRAW_FUNCS:
+            def _record(*args, **kwargs):
+                self.ops.append([key] + list(args) + [kwargs])
+            return _record
+
+        def _call_all(*args, **kwargs):
+            return [getattr(display, key)(*args, **kwargs)
+                for display in self.members]
+        return _call_all
+
+    def add_display(self, display):
+        """
+        Add a display to the group.
+
+        display:
+        The bitmap display to add
+        """
+
+        if display not in self.members:
+            self.members.append(display)
+
+    def remove_display(self, display):
+        """
+        Remove a display from the group.
+
+        display:
+        The display to remove
+        """
+
+        if display in self.members:
+            self.members.remove(display)
+
+    def draw(self, ops):
+        """
+        Record a list of drawing operations, see BitmapDisplay.draw().
+
+        ops:
+        The list of operations
+        """
+
+        self.ops.extend(ops)
+
+    def get_kinds(self):
+        """
+        Get the displays of the group by kind as a list of lists.
+        Displays are of the same kind if they have the same class
+        and bitmap size, i.e. they would receive the same message.
+        """
+
+        kinds = {}
+        for display in self.members:
+            key = (type(display), display.bitmap_width, display.bitmap_height)
+            kinds.setdefault(key, []).append(display)
+        return list(kinds.values())
+
+    def commit(self, force = False):
+        """
+        Execute the recorded drawing operations and send the result
+        to all displays of the group. Returns a dict with the list of
+        results for every display as 'statuses' (None for displays which
+        already showed the bitmap) and the result of the drawing operations
+        as 'draw', like the one of BitmapDisplay.draw() (None if the group
+        is empty). An operation counts as drawn if it was drawn on any kind
+        of display and as failed if it failed on any of them.
+
+        force:
+        Same as for BitmapDisplay.commit()
+        """
+
+        ops, self.ops = self.ops, []
+        statuses = {}
+        outcomes = None
+        for displays in self.get_kinds():
+            # The first display of a kind does the rendering and encoding
+            # for all of them
+            display = displays[0]
+            kind_outcomes = display.run_ops(ops)
+            if outcomes is None:
+                outcomes = kind_outcomes
+            else:
+                outcomes = [
+                    old if isinstance(old, str) or new is False else new
+                    for old, new in zip(outcomes, kind_outcomes)]
+            display.render()
+            message = bytes(display.encode())
+            digest = hashlib.sha1(message).digest()
+            last_digest = display.manager.frame_digests.get(display.port)
+            update = None
+            if not force and last_digest is not None and \
+            display.committed_fb is not None:
+                update = display.encode_update(display.committed_fb)
+                if update is not None:
+                    update = bytes(update)
+
+            for member in displays:
+                member_digest = member.manager.frame_digests.get(member.port)
+                if not force and member_digest == digest:
+                    member.skipped_commits += 1
+                    statuses[id(member)] = None
+                    if member is display and not display.retained:
+                        display.init_image()
+                    continue
+                # The partial update only applies to displays that showed
+                # the same bitmap as the first one
+                if update is not None and member_digest == last_digest:
+                    status = member._send_bitmap(update, digest)
+                else:
+                    status = member._send_bitmap(message, digest)
+                if member is display:
+                    # Only the first display keeps track of its bitmap,
+                    # once it has been sent
+                    display._store_committed()
+                else:
+                    member.committed_fb = None
+                statuses[id(member)] = status
+        return {
+            'statuses': [statuses[id(display)] for display in self.members],
+            'draw': None if outcomes is None else \
+                self.members[0].summarize_ops(outcomes)
+        }
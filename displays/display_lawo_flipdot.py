@@ -2,6 +2,7 @@
 (C) 2016 Julian Metzler
 """
 
+from . import packing
 from .display_bitmap import BitmapDisplay
 
 class LAWOFlipdotDisplay(BitmapDisplay):
@@ -11,34 +12,101 @@ class LAWOFlipdotDisplay(BitmapDisplay):
     
     DEFAULT_FONT = "Luminator16_Bold"
     
+    def __init__(self, width, height, name = None,
+        bitmap_width = None, bitmap_height = None, font_handler = None,
+        partial_updates = False):
+        """
+        width, height, name, bitmap_width, bitmap_height, font_handler:
+        Same as for BitmapDisplay()
+        
+        partial_updates:
+        Whether the display's firmware supports partial bitmaps (0xA5),
+        see set_partial_updates()
+        """
+        
+        super().__init__(width, height, name, bitmap_width, bitmap_height,
+            font_handler)
+        self.partial_updates = partial_updates
+    
     def __str__(self):
         return "LAWO Flipdot Display '{name}' ({width} x {height})".format(
             name = self.name, width = self.width, height = self.height)
 
-    def commit(self):
+    def encode(self):
         """
-        Send the current internal bitmap to the display.
+        Encode the current internal bitmap into a message for the display.
         
         BITMAP FORMAT:
         A list of bytes, two consecutive bytes representing a 16-pixel
         display column from top to bottom.
         """
         
-        pixels = self.img.load()
-        width, height = self.img.size
-        bitmap = []
-        for x in range(width):
-            col_byte = 0x00
-            for y in range(height):
-                if pixels[x, y] > 127:
-                    col_byte += 1 << (8 - y%8 - 1)
-                if (y+1) % 8 == 0:
-                    bitmap.append(col_byte)
-                    col_byte = 0x00
-        
-        self.init_image()
-        return self.send_message(
-            [0xFF, 0xA0, len(bitmap)] + bitmap)
+        width, height = self.fb.size
+        length = height // 8 * width
+        message = self.get_tx_buffer(3 + length)
+        message[0:3] = (0xFF, 0xA0, length)
+        packing.pack_columns(self.fb.data, width, height,
+            message, 3)
+        return message
+    
+    def encode_columns(self, columns, width, height):
+        """
+        Encode a bitmap given as packed columns into a message
+        for the display.
+        
+        columns, width, height:
+        Same as for BitmapDisplay.encode_columns()
+        
+        BITMAP FORMAT:
+        Same as for encode()
+        """
+        
+        length = height // 8 * width
+        message = self.get_tx_buffer(3 + length)
+        message[0:3] = (0xFF, 0xA0, length)
+        message[3:] = columns
+        return message
+    
+    def encode_update(self, previous):
+        """
+        Encode the range of columns that differ from the bitmap currently
+        shown by the display.
+        
+        previous:
+        The framebuffer currently shown by the display
+        
+        BITMAP FORMAT:
+        The index of the first changed column and the number of bytes,
+        followed by the changed columns in the same format as for encode()
+        """
+        
+        if not self.partial_updates:
+            return None
+        width, height = self.fb.size
+        dirty = self.fb.get_changed_columns(previous)
+        if dirty is None or dirty == (0, width - 1):
+            return None
+        
+        first, last = dirty
+        num_cols = last - first + 1
+        length = height // 8 * num_cols
+        message = self.get_tx_buffer(4 + length)
+        message[0:4] = (0xFF, 0xA5, first, length)
+        packing.pack_columns(self.fb.crop(first, 0, num_cols, height).data,
+            num_cols, height, message, 4)
+        return message
+    
+    def set_partial_updates(self, state):
+        """
+        Enable or disable sending only the changed columns of a bitmap.
+        This requires a firmware supporting partial bitmaps (0xA5), older
+        firmware silently ignores them.
+        
+        state:
+        Whether partial updates should be sent
+        """
+        
+        self.partial_updates = bool(state)
     
     def set_backlight(self, state):
         """
@@ -0,0 +1,185 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the code for a virtual display whose bitmap is spread
+across several physical displays.
+"""
+
+from .display_bitmap import BitmapDisplay
+
+class VirtualDisplay(BitmapDisplay):
+    """
+    A large canvas which is shown on several bitmap displays, each of them
+    showing the part of the canvas at its offset.
+    Everything is drawn once on the canvas. On commit, every display
+    receives its part, and displays whose part hasn't changed
+    are skipped.
+    """
+
+    def __init__(self, width, height, name = None, font_handler = None):
+        """
+        width:
+        The width of the canvas in pixels
+
+        height:
+        The height of the canvas in pixels
+
+        name, font_handler:
+        Same as for BitmapDisplay()
+        """
+
+        super().__init__(width, height, name, font_handler = font_handler)
+        # Tuples (display, x, y)
+        self.members = []
+
+    def __str__(self):
+        return "Virtual Display '{name}' ({width} x {height}, " \
+            "{count} displays)".format(name = self.name, width = self.width,
+            height = self.height, count = len(self.members))
+
+    def add_display(self, display, x = 0, y = 0):
+        """
+        Show a part of the canvas on a display. The display should not be
+        drawn on directly while it is part of the virtual display.
+
+        display:
+        The bitmap display to add
+
+        x:
+        The x position of the left edge of the display on the canvas
+
+        y:
+        The y position of the top edge of the display on the canvas
+        """
+
+        self.remove_display(display)
+        self.members.append((display, x, y))
+
+    def remove_display(self, display):
+        """
+        Stop showing the canvas on a display.
+
+        display:
+        The display to remove
+        """
+
+        self.members = [member for member in self.members
+            if member[0] is not display]
+
+    def commit(self, force = False):
+        """
+        Send the parts of the canvas to the displays.
+        Returns a list of the results of the displays' commit() calls,
+        None for every display that already showed its part.
+
+        force:
+        Same as for BitmapDisplay.commit()
+        """
+
+        self.render()
+        statuses = self._commit_members(self.fb, force)
+        # The canvas is kept for commit_regions()
+        self._store_committed()
+        return statuses
+
+    def _commit_frame(self, frame, force):
+        """
+        Send the parts of a canvas other than the internal one,
+        see BitmapDisplay.commit_regions().
+
+        frame:
+        The framebuffer containing the canvas
+
+        force:
+        Same as for BitmapDisplay.commit()
+        """
+
+        statuses = self._commit_members(frame, force)
+        self.committed_fb = frame
+        return statuses
+
+    def _commit_members(self, frame, force):
+        """
+        Commit the parts of a canvas to the displays.
+
+        frame:
+        The framebuffer containing the canvas
+
+        force:
+        Same as for BitmapDisplay.commit()
+        """
+
+        statuses = []
+        for display, x, y in self.members:
+            display.fb.extract(frame, x, y)
+            statuses.append(display.commit(force))
+        return statuses
+
+    def transition(self, *args, **kwargs):
+        """
+        Not supported, since the displays can't be kept in sync.
+        """
+
+        raise NotImplementedError(
+            "Transitions aren't supported by virtual displays")
+
+    def scroll(self, *args, **kwargs):
+        """
+        Not supported, since the displays can't be kept in sync.
+        """
+
+        raise NotImplementedError(
+            "Scrolling isn't supported by virtual displays")
+
+    def animate(self, *args, **kwargs):
+        """
+        Not supported, since the displays can't be kept in sync.
+        """
+
+        raise NotImplementedError(
+            "Animations aren't supported by virtual displays")
+
+    def start_ticker(self, *args, **kwargs):
+        """
+        Not supported, since the displays can't be kept in sync.
+        """
+
+        raise NotImplementedError(
+            "Tickers aren't supported by virtual displays")
+
+    def start_pipeline(self, depth = 2):
+        """
+        Commit the parts of the canvas through a pipeline for every display,
+        see BitmapDisplay.start_pipeline().
+
+        depth:
+        Same as for BitmapDisplay.start_pipeline()
+        """
+
+        for display, x, y in self.members:
+            display.start_pipeline(depth)
+
+    def stop_pipeline(self):
+        """
+        Stop the pipelines of the displays.
+        """
+
+        for display, x, y in self.members:
+            display.stop_pipeline()
+
+    def flush_pipeline(self):
+        """
+        Wait until the pipelines of all displays have sent their bitmaps.
+        """
+
+        for display, x, y in self.members:
+            display.flush_pipeline()
+
+    def get_pipeline_stats(self):
+        """
+        Get the pipeline statistics of every display as a list,
+        see BitmapDisplay.get_pipeline_stats().
+        """
+
+        return [display.get_pipeline_stats()
+            for display, x, y in self.members]
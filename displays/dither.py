@@ -0,0 +1,188 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the code for converting arbitrary images to 1 bit,
+scaling them to the desired size and dithering them.
+"""
+
+from PIL import Image, ImageChops
+
+from .framebuffer import Framebuffer, Sprite
+
+METHODS = ('threshold', 'bayer', 'floyd-steinberg', 'atkinson')
+
+# Lookup table for thresholding at the same level as Framebuffer.from_image
+THRESHOLD = [0] * 128 + [255] * 128
+
+# Tiled threshold maps for ordered dithering by size
+_bayer_cache = {}
+
+def bayer_matrix(order):
+    """
+    Get a Bayer matrix for ordered dithering as a list of rows.
+    The matrix has 2 ** order rows and columns and contains
+    every value from 0 to 4 ** order - 1 once.
+
+    order:
+    The order of the matrix
+    """
+
+    matrix = [[0]]
+    for _ in range(order):
+        top = [[4 * value for value in row] + [4 * value + 2 for value in row]
+            for row in matrix]
+        bottom = [[4 * value + 3 for value in row] +
+            [4 * value + 1 for value in row] for row in matrix]
+        matrix = top + bottom
+    return matrix
+
+def get_threshold_map(size, order = 3):
+    """
+    Get an image of mode 'L' covering the given size with a tiled Bayer
+    matrix, scaled so that a pixel is set if it is brighter than the
+    corresponding pixel of the map.
+
+    size:
+    The size of the map as (width, height)
+
+    order:
+    The order of the Bayer matrix
+    """
+
+    key = (size, order)
+    threshold_map = _bayer_cache.get(key)
+    if threshold_map is not None:
+        return threshold_map
+
+    matrix = bayer_matrix(order)
+    count = len(matrix) ** 2
+    tile = Image.new('L', (len(matrix), len(matrix)))
+    tile.putdata([(value * 2 + 1) * 128 // count
+        for row in matrix for value in row])
+    threshold_map = Image.new('L', size)
+    for top in range(0, size[1], tile.size[1]):
+        for left in range(0, size[0], tile.size[0]):
+            threshold_map.paste(tile, (left, top))
+    _bayer_cache[key] = threshold_map
+    return threshold_map
+
+def scale(img, size):
+    """
+    Scale an image to fit into the given size, keeping its aspect ratio.
+
+    img:
+    The PIL image to scale
+
+    size:
+    The maximum size as (width, height), either can be None
+    """
+
+    width, height = img.size
+    max_width = size[0] or width * size[1] / height
+    max_height = size[1] or height * size[0] / width
+    factor = min(max_width / width, max_height / height)
+    new_size = (max(1, round(width * factor)),
+        max(1, round(height * factor)))
+    if new_size == img.size:
+        return img
+    return img.resize(new_size, Image.LANCZOS)
+
+def atkinson(img):
+    """
+    Dither an image of mode 'L' using Atkinson's error diffusion,
+    which only passes on 3/4 of the error and keeps more contrast
+    than Floyd-Steinberg. Returns an image of mode 'L'.
+
+    img:
+    The image to dither
+    """
+
+    width, height = img.size
+    # Two extra columns on either side and two extra rows at the bottom
+    # so the error can be passed on without checking the bounds
+    stride = width + 4
+    values = [0] * (stride * (height + 2))
+    source = img.tobytes()
+    for y in range(height):
+        values[y * stride + 2:y * stride + 2 + width] = \
+            source[y * width:(y + 1) * width]
+    neighbours = (1, 2, stride - 1, stride, stride + 1, 2 * stride)
+
+    result = bytearray(width * height)
+    for y in range(height):
+        index = y * stride + 2
+        for x in range(y * width, (y + 1) * width):
+            value = values[index]
+            if value > 127:
+                result[x] = 255
+                error = (value - 255) >> 3
+            else:
+                error = value >> 3
+            if error:
+                for offset in neighbours:
+                    values[index + offset] += error
+            index += 1
+    return Image.frombytes('L', img.size, bytes(result))
+
+def dither(img, method = 'threshold'):
+    """
+    Convert an image of mode 'L' into a framebuffer.
+
+    img:
+    The image to convert
+
+    method:
+    The conversion method:
+    'threshold': Set all pixels brighter than 127
+    'bayer': Ordered dithering using an 8x8 Bayer matrix
+    'floyd-steinberg': Floyd-Steinberg error diffusion
+    'atkinson': Atkinson error diffusion
+    """
+
+    if method == 'threshold':
+        img = img.point(THRESHOLD)
+    elif method == 'bayer':
+        # Pixels brighter than the threshold map remain above zero
+        img = ImageChops.subtract(img, get_threshold_map(img.size)).point(
+            lambda value: 255 if value else 0)
+    elif method == 'floyd-steinberg':
+        img = img.convert('1', dither = Image.FLOYDSTEINBERG)
+    elif method == 'atkinson':
+        img = atkinson(img)
+    else:
+        raise ValueError("Unknown dithering method '{0}'".format(method))
+    return Framebuffer.from_image(img)
+
+def convert_image(img, size = None, method = 'threshold'):
+    """
+    Convert an arbitrary image into a sprite.
+    Transparent pixels (alpha below 128) are left out.
+
+    img:
+    The PIL image to convert
+
+    size:
+    The maximum size as (width, height), either can be None.
+    The image is scaled to fit, keeping its aspect ratio.
+
+    method:
+    Same as for dither()
+    """
+
+    if method not in METHODS:
+        raise ValueError("Unknown dithering method '{0}'".format(method))
+    if 'A' in img.mode or 'transparency' in img.info:
+        img = img.convert('RGBA')
+    else:
+        img = img.convert('L')
+    if size is not None:
+        img = scale(img, size)
+
+    if img.mode == 'RGBA':
+        mask = Framebuffer.from_image(img.getchannel('A').point(THRESHOLD))
+        if mask.popcount() == mask.width * mask.height:
+            mask = None
+        img = img.convert('L')
+    else:
+        mask = None
+    return Sprite(dither(img, method), mask)
@@ -0,0 +1,134 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the code for tables of precomputed frames, used for
+widgets which can only show a limited number of different images.
+"""
+
+import os
+
+from .framebuffer import Framebuffer, Sprite
+
+class FrameTable:
+    """
+    A table of all frames of a widget with a fixed size,
+    e.g. one frame for every minute of a clock.
+    Frames are rendered when they are first needed. If the table is stored
+    on disk, it is loaded from there or completely built and saved
+    on first use instead.
+    """
+
+    def __init__(self, width, height, count, render, masked = False,
+            path = None):
+        """
+        width:
+        The width of the frames
+
+        height:
+        The height of the frames
+
+        count:
+        The number of frames
+
+        render:
+        A function returning the framebuffer for a given frame index
+
+        masked:
+        Whether only the set pixels of a frame should be inserted
+        (otherwise the frames are opaque)
+
+        path:
+        The file to store the table in (optional)
+        """
+
+        self.width = width
+        self.height = height
+        self.count = count
+        self.render = render
+        self.masked = masked
+        self.path = path
+        self.frames = [None] * count
+        self.frame_size = (width + 7) // 8 * height
+        if path is not None and not self.load():
+            self.build()
+            self.save()
+
+    def __repr__(self):
+        return "<FrameTable {0} x {1}, {2} frames>".format(self.width,
+            self.height, self.count)
+
+    @property
+    def nbytes(self):
+        return self.frame_size * self.count
+
+    def _make_sprite(self, fb):
+        """
+        Wrap a rendered frame in a sprite.
+
+        fb:
+        The framebuffer containing the frame
+        """
+
+        return Sprite(fb, fb if self.masked else None)
+
+    def get(self, index):
+        """
+        Get a frame as a sprite, rendering it if necessary.
+
+        index:
+        The index of the frame
+        """
+
+        sprite = self.frames[index]
+        if sprite is None:
+            sprite = self._make_sprite(self.render(index))
+            self.frames[index] = sprite
+        return sprite
+
+    def build(self):
+        """
+        Render all frames that haven't been rendered yet.
+        """
+
+        for index in range(self.count):
+            self.get(index)
+
+    def load(self):
+        """
+        Load the table from its file. Returns whether it could be loaded.
+        """
+
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return False
+        if len(data) != self.nbytes:
+            return False
+
+        for index in range(self.count):
+            start = index * self.frame_size
+            fb = Framebuffer(self.width, self.height,
+                data[start:start + self.frame_size])
+            self.frames[index] = self._make_sprite(fb)
+        return True
+
+    def save(self):
+        """
+        Save the table to its file. All frames have to be rendered.
+        """
+
+        data = b"".join(bytes(sprite.pixels.data) for sprite in self.frames)
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok = True)
+            # Write to a temporary file first so other processes
+            # never read a partial table
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, self.path)
+        except OSError:
+            # The table still works without being stored
+            pass
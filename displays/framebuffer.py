@@ -0,0 +1,506 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the code for the 1-bit framebuffer used to store bitmaps.
+PIL is only used to convert from and to images.
+"""
+
+from PIL import Image
+
+# Lookup table to invert all bits of a byte
+INVERTED_BITS = bytes(0xFF - i for i in range(256))
+
+class Framebuffer:
+    """
+    A 1-bit bitmap stored as packed rows.
+    Rows go from top to bottom, every row is padded to a full byte
+    and the leftmost pixel of every byte is its MSB.
+    This is the same format PIL uses for images in mode '1'.
+    """
+
+    def __init__(self, width, height, data = None):
+        """
+        width:
+        The width of the bitmap in pixels
+
+        height:
+        The height of the bitmap in pixels
+
+        data:
+        The packed bitmap data to initialise the framebuffer with
+        (cleared if not specified)
+        """
+
+        self.width = width
+        self.height = height
+        self.stride = (width + 7) // 8
+        self.padding = self.stride * 8 - width
+        if data is None:
+            self.data = bytearray(self.stride * height)
+        else:
+            self.data = bytearray(data)
+            if len(self.data) != self.stride * height:
+                raise ValueError("Expected {0} bytes of data, got {1}".format(
+                    self.stride * height, len(self.data)))
+
+    def __repr__(self):
+        return "<Framebuffer {0} x {1}>".format(self.width, self.height)
+
+    def __eq__(self, other):
+        if not isinstance(other, Framebuffer):
+            return NotImplemented
+        return self.size == other.size and self.data == other.data
+
+    def __and__(self, other):
+        return self._combine(other, lambda a, b: a & b)
+
+    def __or__(self, other):
+        return self._combine(other, lambda a, b: a | b)
+
+    def __xor__(self, other):
+        return self._combine(other, lambda a, b: a ^ b)
+
+    def __invert__(self):
+        inverted = self.copy()
+        inverted.invert()
+        return inverted
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    @classmethod
+    def from_image(cls, img):
+        """
+        Create a framebuffer from an image.
+        Pixels brighter than 127 are set, all others are cleared.
+
+        img:
+        The PIL image to convert
+        """
+
+        if img.mode != '1':
+            img = img.convert('1', dither = Image.NONE)
+        return cls(img.size[0], img.size[1], img.tobytes())
+
+    def to_image(self):
+        """
+        Convert the framebuffer into an image of mode '1'.
+        """
+
+        return Image.frombytes('1', self.size, bytes(self.data))
+
+    def copy(self):
+        """
+        Return an independent copy of the framebuffer.
+        """
+
+        return Framebuffer(self.width, self.height, self.data)
+
+    def _combine(self, other, operation):
+        """
+        Combine two framebuffers of the same size bit by bit.
+
+        other:
+        The framebuffer to combine this one with
+
+        operation:
+        A function combining two integers
+        """
+
+        if self.size != other.size:
+            raise ValueError("Framebuffer sizes do not match: {0} and {1}"
+                .format(self.size, other.size))
+
+        result = operation(int.from_bytes(self.data, 'big'),
+            int.from_bytes(other.data, 'big'))
+        return Framebuffer(self.width, self.height,
+            result.to_bytes(len(self.data), 'big'))
+
+    def _row_mask(self):
+        """
+        Get an integer with every bit of a row set.
+        """
+
+        return (1 << self.width) - 1
+
+    def clear(self):
+        """
+        Clear all pixels.
+        """
+
+        self.data[:] = bytes(len(self.data))
+
+    def fill(self):
+        """
+        Set all pixels.
+        """
+
+        self.data[:] = b'\xFF' * len(self.data)
+        self._clear_padding()
+
+    def invert(self):
+        """
+        Invert all pixels.
+        """
+
+        self.data[:] = self.data.translate(INVERTED_BITS)
+        self._clear_padding()
+
+    def _clear_padding(self):
+        """
+        Clear the padding bits at the end of every row.
+        """
+
+        if not self.padding:
+            return
+        keep = 0xFF << self.padding & 0xFF
+        for end in range(self.stride - 1, len(self.data), self.stride):
+            self.data[end] &= keep
+
+    def popcount(self):
+        """
+        Get the number of set pixels.
+        """
+
+        return bin(int.from_bytes(self.data, 'big')).count('1')
+
+    def get_pixel(self, x, y):
+        """
+        Get the state of a single pixel.
+
+        x:
+        The x coordinate of the pixel
+
+        y:
+        The y coordinate of the pixel
+        """
+
+        return bool(self.data[y * self.stride + x // 8] & 0x80 >> x % 8)
+
+    def set_pixel(self, x, y, value):
+        """
+        Set the state of a single pixel.
+
+        x, y:
+        Same as for get_pixel()
+
+        value:
+        Whether the pixel should be set
+        """
+
+        if value:
+            self.data[y * self.stride + x // 8] |= 0x80 >> x % 8
+        else:
+            self.data[y * self.stride + x // 8] &= ~(0x80 >> x % 8) & 0xFF
+
+    def row_view(self, y):
+        """
+        Get a writable view of the packed data of a single row.
+
+        y:
+        The index of the row
+        """
+
+        return memoryview(self.data)[y * self.stride:(y + 1) * self.stride]
+
+    def get_row(self, y):
+        """
+        Get a row as an integer, the leftmost pixel being the MSB.
+
+        y:
+        The index of the row
+        """
+
+        start = y * self.stride
+        return int.from_bytes(
+            self.data[start:start + self.stride], 'big') >> self.padding
+
+    def set_row(self, y, value):
+        """
+        Set a row from an integer, the leftmost pixel being the MSB.
+
+        y:
+        The index of the row
+
+        value:
+        The row as an integer
+        """
+
+        start = y * self.stride
+        self.data[start:start + self.stride] = (
+            (value & self._row_mask()) << self.padding).to_bytes(
+            self.stride, 'big')
+
+    def get_rows(self):
+        """
+        Get all rows as a list of integers.
+        """
+
+        return [self.get_row(y) for y in range(self.height)]
+
+    def get_column(self, x):
+        """
+        Get a column as an integer, the top pixel being the MSB.
+
+        x:
+        The index of the column
+        """
+
+        index = x // 8
+        bit = 0x80 >> x % 8
+        column = 0
+        for start in range(index, len(self.data), self.stride):
+            column = column << 1 | bool(self.data[start] & bit)
+        return column
+
+    def get_columns(self):
+        """
+        Get all columns as lists of booleans (top to bottom).
+        """
+
+        rows = ["{0:0{1}b}".format(row, self.width) for row in self.get_rows()]
+        return [[pixel == "1" for pixel in column] for column in zip(*rows)]
+
+    def get_changed_columns(self, other):
+        """
+        Get the range of columns in which this framebuffer differs
+        from another one of the same size as a tuple (first, last),
+        or None if they are identical.
+
+        other:
+        The framebuffer to compare this one with
+        """
+
+        if self.size != other.size:
+            raise ValueError("Framebuffer sizes do not match: {0} and {1}"
+                .format(self.size, other.size))
+
+        diff = 0
+        for y in range(self.height):
+            diff |= self.get_row(y) ^ other.get_row(y)
+        if not diff:
+            return None
+        first = self.width - diff.bit_length()
+        last = self.width - (diff & -diff).bit_length()
+        return first, last
+
+    def crop(self, left, top, width, height):
+        """
+        Return a part of the framebuffer as a new framebuffer.
+        Areas outside of this framebuffer are cleared.
+
+        left:
+        The x coordinate of the left edge of the area
+
+        top:
+        The y coordinate of the top edge of the area
+
+        width:
+        The width of the area
+
+        height:
+        The height of the area
+        """
+
+        cropped = Framebuffer(width, height)
+        cropped.extract(self, left, top)
+        return cropped
+
+    def extract(self, src, left, top):
+        """
+        Replace the contents of this framebuffer with an area of the same
+        size from another framebuffer. Areas outside of src are cleared.
+        If the area starts at a full byte, rows are copied as slices.
+
+        src:
+        The framebuffer to copy from
+
+        left:
+        The x coordinate of the left edge of the area in src
+
+        top:
+        The y coordinate of the top edge of the area in src
+        """
+
+        if left % 8 == 0 and left >= 0 and top >= 0 and \
+                left + self.width <= src.width and \
+                top + self.height <= src.height:
+            src_data = memoryview(src.data)
+            start = top * src.stride + left // 8
+            for y in range(self.height):
+                self.data[y * self.stride:(y + 1) * self.stride] = \
+                    src_data[start:start + self.stride]
+                start += src.stride
+            self._clear_padding()
+            return
+
+        self.clear()
+        self.blit(src, -left, -top)
+
+    def blit(self, src, x, y, mask = None):
+        """
+        Copy another framebuffer into this one.
+
+        src:
+        The framebuffer to copy
+
+        x:
+        The x coordinate of the left edge of src
+
+        y:
+        The y coordinate of the top edge of src
+
+        mask:
+        A framebuffer of the same size as src, only the pixels set
+        in the mask are copied. If not specified, all pixels are copied.
+        """
+
+        if mask is not None and mask.size != src.size:
+            raise ValueError("Mask size {0} does not match source size {1}"
+                .format(mask.size, src.size))
+
+        if (x, y) == (0, 0) and src.size == self.size:
+            # Fast path: Process the whole bitmap at once
+            if mask is None:
+                self.data[:] = src.data
+            else:
+                dst = int.from_bytes(self.data, 'big')
+                bits = int.from_bytes(src.data, 'big')
+                keep = int.from_bytes(mask.data, 'big')
+                self.data[:] = (dst & ~keep | bits & keep).to_bytes(
+                    len(self.data), 'big')
+            return
+
+        # Place the rows of src in an integer covering the whole bitmap
+        # so it can be combined with this one in a single operation
+        row_bits = self.stride * 8
+        row_mask = self._row_mask() << self.padding
+        shift = row_bits - x - src.width
+        full_mask = (1 << src.width) - 1
+        bits = keep = 0
+        for src_y in range(max(0, -y), min(src.height, self.height - y)):
+            src_bits = src.get_row(src_y)
+            row_keep = full_mask if mask is None else mask.get_row(src_y)
+            if shift >= 0:
+                src_bits <<= shift
+                row_keep <<= shift
+            else:
+                src_bits >>= -shift
+                row_keep >>= -shift
+            offset = (self.height - 1 - src_y - y) * row_bits
+            bits |= (src_bits & row_mask) << offset
+            keep |= (row_keep & row_mask) << offset
+        if not keep:
+            return
+
+        dst = int.from_bytes(self.data, 'big')
+        self.data[:] = (dst & ~keep | bits & keep).to_bytes(
+            len(self.data), 'big')
+
+    def fill_rect(self, left, top, right, bottom, value = True):
+        """
+        Set or clear a rectangular area.
+
+        left, top, right, bottom:
+        The coordinates of the edges of the area (inclusive)
+
+        value:
+        Whether the pixels should be set or cleared
+        """
+
+        left, right = max(0, left), min(self.width - 1, right)
+        top, bottom = max(0, top), min(self.height - 1, bottom)
+        if left > right or top > bottom:
+            return
+
+        bits = ((1 << right - left + 1) - 1) << (self.width - right - 1)
+        for y in range(top, bottom + 1):
+            row = self.get_row(y)
+            self.set_row(y, row | bits if value else row & ~bits)
+
+class Sprite:
+    """
+    A 1-bit bitmap with a transparency mask, used to insert
+    rendered images into a framebuffer.
+    """
+
+    def __init__(self, pixels, mask = None):
+        """
+        pixels:
+        A framebuffer containing the pixels of the sprite
+
+        mask:
+        A framebuffer of the same size, only the pixels set in the mask
+        are inserted. If not specified, the sprite is opaque.
+        """
+
+        self.pixels = pixels
+        self.mask = mask
+
+    def __repr__(self):
+        return "<Sprite {0} x {1}>".format(self.width, self.height)
+
+    @property
+    def width(self):
+        return self.pixels.width
+
+    @property
+    def height(self):
+        return self.pixels.height
+
+    @property
+    def size(self):
+        return self.pixels.size
+
+    @property
+    def nbytes(self):
+        mask_size = len(self.mask.data) if self.mask else 0
+        return len(self.pixels.data) + mask_size
+
+    @classmethod
+    def from_image(cls, img):
+        """
+        Create a sprite from an image, using the image itself as the mask
+        (the same way PIL's paste() would).
+        The result matches pasting the image onto an 8-bit bitmap
+        and thresholding it afterwards.
+
+        img:
+        The PIL image to convert
+        """
+
+        # Pixels which light up on a dark background are set,
+        # pixels which go dark on a light background are cleared
+        on_black = Image.new('L', img.size, 'black')
+        on_black.paste(img, (0, 0), img)
+        on_white = Image.new('L', img.size, 'white')
+        on_white.paste(img, (0, 0), img)
+        pixels = Framebuffer.from_image(on_black)
+        mask = pixels | ~Framebuffer.from_image(on_white)
+        return cls(pixels, mask)
+
+    @classmethod
+    def from_mask(cls, mask, color = True):
+        """
+        Create a single-colored sprite from a mask.
+
+        mask:
+        A framebuffer containing the shape of the sprite
+
+        color:
+        Whether the pixels of the shape should be set or cleared
+        """
+
+        pixels = mask.copy() if color else Framebuffer(*mask.size)
+        return cls(pixels, mask)
+
+    def to_image(self):
+        """
+        Convert the sprite into an RGBA image.
+        """
+
+        img = Image.new('RGBA', self.size, (0, 0, 0, 0))
+        mask = self.mask.to_image() if self.mask else None
+        img.paste(self.pixels.to_image().convert('RGBA'), (0, 0), mask)
+        return img
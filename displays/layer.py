@@ -0,0 +1,109 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the code for bitmap layers which are composited
+into the bitmap of a display.
+"""
+
+from .framebuffer import Framebuffer
+
+class Layer:
+    """
+    A transparent bitmap which keeps track of whether it has been changed.
+    """
+
+    def __init__(self, width, height, z = 0, static = False):
+        """
+        width:
+        The width of the layer in pixels
+
+        height:
+        The height of the layer in pixels
+
+        z:
+        The position of the layer in the stack, layers with higher values
+        are drawn on top of those with lower values
+
+        static:
+        Whether the layer should be kept after a commit
+        """
+
+        self.pixels = Framebuffer(width, height)
+        self.mask = Framebuffer(width, height)
+        self.z = z
+        self.static = static
+        # Whether the layer has been changed since it was last composited
+        self.dirty = False
+        # Whether nothing has been drawn into the layer
+        self.empty = True
+
+    def __repr__(self):
+        return "<Layer z={0}{1}>".format(self.z,
+            " static" if self.static else "")
+
+    def paste(self, sprite, x, y):
+        """
+        Insert a sprite into the layer.
+
+        sprite:
+        The sprite to insert
+
+        x, y:
+        The position of the upper left corner of the sprite
+        """
+
+        self.pixels.blit(sprite.pixels, x, y, sprite.mask)
+        if sprite.mask is None:
+            self.mask.fill_rect(x, y, x + sprite.width - 1,
+                y + sprite.height - 1)
+        else:
+            self.mask.blit(sprite.mask, x, y, sprite.mask)
+        self.dirty = True
+        self.empty = False
+
+    def clear(self):
+        """
+        Make the whole layer transparent.
+        """
+
+        if self.empty:
+            return
+        self.pixels.clear()
+        self.mask.clear()
+        self.dirty = True
+        self.empty = True
+
+    def fill(self, value = True):
+        """
+        Make the whole layer opaque.
+
+        value:
+        Whether the pixels should be set or cleared
+        """
+
+        if value:
+            self.pixels.fill()
+        else:
+            self.pixels.clear()
+        self.mask.fill()
+        self.dirty = True
+        self.empty = False
+
+def composite(layers, fb):
+    """
+    Draw layers into a framebuffer in the order of their z values.
+    Returns the framebuffer.
+
+    layers:
+    An iterable of layers
+
+    fb:
+    The framebuffer to draw into, it is cleared first
+    """
+
+    fb.clear()
+    for layer in sorted(layers, key = lambda layer: layer.z):
+        if not layer.empty:
+            fb.blit(layer.pixels, 0, 0, layer.mask)
+        layer.dirty = False
+    return fb
@@ -5,6 +5,7 @@ This file contains the code for controlling the display multiplex board.
 """
 
 import serial
+import threading
 from .error import DisplayError, DisplayManagerError
 
 class DummyDisplayManager:
@@ -36,11 +37,30 @@ class DisplayManager:
         The serial port timeout in milliseconds
         """
         
+        self.port_name = port
         self.baudrate = baudrate
+        self.timeout = timeout
         # Timeout set to 1 until a reliable method for receiving data is found
         self.port = serial.serial_for_url(port,
             baudrate = baudrate, timeout = timeout)
         self.displays = {}
+        # Digests of the last bitmap sent to each port
+        self.frame_digests = {}
+        # Keeps messages sent from different threads (e.g. by a pipeline)
+        # from being interleaved
+        self.lock = threading.RLock()
+    
+    def reconnect(self):
+        """
+        Close and reopen the serial port.
+        Since the displays may have been reset in the meantime,
+        the next bitmap will be sent to every display in any case.
+        """
+        
+        self.port.close()
+        self.port = serial.serial_for_url(self.port_name,
+            baudrate = self.baudrate, timeout = self.timeout)
+        self.frame_digests.clear()
     
     def register_display(self, port, display):
         """
@@ -66,6 +86,7 @@ class DisplayManager:
         display.manager = self
         display.port = port
         self.displays[port] = display
+        self.frame_digests.pop(port, None)
     
     def unregister_display(self, port):
         """
@@ -84,6 +105,7 @@ class DisplayManager:
         self.displays[port].manager = DummyDisplayManager()
         self.displays[port].port = None
         del self.displays[port]
+        self.frame_digests.pop(port, None)
 
     def write(self, data):
         if type(data) is int:
@@ -143,9 +165,10 @@ class DisplayManager:
         Whether to wait for a reply from the display
         """
         
-        self.send_header(port, len(message))
-        self.write(message)
-        return self.check_status() if expect_reply else None
+        with self.lock:
+            self.send_header(port, len(message))
+            self.write(message)
+            return self.check_status() if expect_reply else None
     
     def set_programming(self, port):
         """
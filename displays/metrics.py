@@ -0,0 +1,167 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the code for measuring texts without rendering them.
+"""
+
+from PIL import Image, ImageDraw
+
+class FontMetrics:
+    """
+    The measurements of the characters of a font at a given size.
+    Every character is only measured once, texts are measured by adding up
+    the measurements of their characters.
+    """
+
+    def __init__(self, imagefont, truetype):
+        """
+        imagefont:
+        The PIL ImageFont to measure
+
+        truetype:
+        Whether the font is a truetype font
+        """
+
+        self.imagefont = imagefont
+        self.truetype = truetype
+        # Tuples (advance, left, right, top, bottom, height) by character,
+        # left, right, top and bottom being the bounds of the rendered
+        # pixels and height being the height of the line
+        self.chars = {}
+        self._line_height = None
+
+    def __repr__(self):
+        return "<FontMetrics for {0} characters>".format(len(self.chars))
+
+    @property
+    def line_height(self):
+        """
+        The distance between the tops of two consecutive lines.
+        """
+
+        if self._line_height is None:
+            if self.truetype:
+                self._line_height = sum(self.imagefont.getmetrics())
+            else:
+                self._line_height = self.imagefont.getsize(" ")[1]
+        return self._line_height
+
+    def get_char(self, char):
+        """
+        Get the measurements of a single character
+        as a tuple (advance, left, right, top, bottom, height).
+
+        char:
+        The character to measure
+        """
+
+        measurements = self.chars.get(char)
+        if measurements is None:
+            # Render the character once in the same way as whole texts
+            # to find out which pixels are actually set
+            width, height = self.imagefont.getsize(char)
+            img = Image.new('1', (max(1, width), max(1, height)), 0)
+            ImageDraw.Draw(img).text((0, 0), char, 1, font = self.imagefont)
+            bbox = img.getbbox()
+            if bbox is None:
+                # Blank characters like spaces
+                left = right = bottom = 0
+                top = height
+            else:
+                left, top, right, bottom = bbox
+            if self.truetype:
+                # Advances of truetype glyphs are fractional
+                advance = self.imagefont.getlength(char)
+            else:
+                advance = width
+            measurements = (advance, left, right, top, bottom, height)
+            self.chars[char] = measurements
+        return measurements
+
+    def get_advances(self, text):
+        """
+        Get the advance widths of all characters of a text.
+
+        text:
+        The text to measure
+        """
+
+        return [self.get_char(char)[0] for char in text]
+
+    def get_width(self, text):
+        """
+        Get the width of a text as it is rendered,
+        i.e. without blank space on either side.
+
+        text:
+        The text to measure
+        """
+
+        if not text:
+            return 0
+        advances = self.get_advances(text)
+        left = self.get_char(text[0])[1]
+        right = self.get_char(text[-1])[2]
+        return max(0, int(round(sum(advances[:-1]))) + right - left)
+
+    def get_height(self, text):
+        """
+        Get the height of a text as it is rendered. Texts in truetype fonts
+        are cropped to their pixels, others keep the height of the line.
+
+        text:
+        The text to measure
+        """
+
+        chars = [self.get_char(char) for char in text]
+        if not chars:
+            return 0
+        if not self.truetype:
+            return max(char[5] for char in chars)
+        top = min(char[3] for char in chars)
+        bottom = max(char[4] for char in chars)
+        return max(0, bottom - top)
+
+    def get_size(self, text):
+        """
+        Get the size of a text as a tuple (width, height).
+
+        text:
+        The text to measure
+        """
+
+        return self.get_width(text), self.get_height(text)
+
+    def wrap(self, text, width):
+        """
+        Break a text into lines which are no wider than the given width.
+        Lines are broken between words, words which are too wide
+        on their own are broken between characters.
+        Line breaks in the text are kept.
+
+        text:
+        The text to break into lines
+
+        width:
+        The maximum width of a line
+        """
+
+        lines = []
+        for paragraph in text.split("\n"):
+            line = ""
+            for word in paragraph.split():
+                candidate = line + " " + word if line else word
+                if self.get_width(candidate) <= width:
+                    line = candidate
+                    continue
+                if line:
+                    lines.append(line)
+                while len(word) > 1 and self.get_width(word) > width:
+                    end = len(word) - 1
+                    while end > 1 and self.get_width(word[:end]) > width:
+                        end -= 1
+                    lines.append(word[:end])
+                    word = word[end:]
+                line = word
+            lines.append(line)
+        return lines
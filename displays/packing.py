@@ -0,0 +1,110 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the code for converting the internal bitmap into
+the bitmap formats used by the displays.
+All functions work on packed 1-bit data, that is whole rows (left to right)
+going from top to bottom, the leftmost pixel of every byte being its MSB
+and every row being padded to a full byte.
+"""
+
+# Lookup table to reverse the bit order of a byte
+REVERSED_BITS = bytes(int("{0:08b}".format(i)[::-1], 2) for i in range(256))
+
+# Masks used to transpose 8x8 bit blocks, see transpose_blocks()
+TRANSPOSE_MASKS = (
+    (7, bytes.fromhex("00AA00AA00AA00AA")),
+    (14, bytes.fromhex("0000CCCC0000CCCC")),
+    (28, bytes.fromhex("00000000F0F0F0F0"))
+)
+
+_mask_cache = {}
+
+def transpose_blocks(blocks):
+    """
+    Transpose a sequence of 8x8 bit blocks at once.
+
+    blocks:
+    The blocks as bytes, each 8 consecutive bytes forming one block
+    (one byte per row, MSB on the left). The result has the same format,
+    but contains one byte per column (top pixel being the MSB).
+    """
+
+    count = len(blocks) // 8
+    masks = _mask_cache.get(count)
+    if masks is None:
+        masks = [(shift, int.from_bytes(mask * count, 'big'))
+            for shift, mask in TRANSPOSE_MASKS]
+        _mask_cache[count] = masks
+
+    x = int.from_bytes(blocks, 'big')
+    for shift, mask in masks:
+        t = (x ^ (x >> shift)) & mask
+        x ^= t ^ (t << shift)
+    return x.to_bytes(len(blocks), 'big')
+
+def pack_rows(data, width, height, out, offset = 0):
+    """
+    Write whole rows (left to right), going from top to bottom,
+    8 pixels per byte with the leftmost pixel being the MSB.
+    Returns the number of bytes written.
+
+    data:
+    The packed 1-bit data to convert
+
+    width:
+    The width of the bitmap in pixels
+
+    height:
+    The height of the bitmap in pixels
+
+    out:
+    The bytearray to write the result to
+
+    offset:
+    The position in out to start writing at
+    """
+
+    length = (width + 7) // 8 * height
+    out[offset:offset + length] = data[:length]
+    return length
+
+def pack_columns(data, width, height, out, offset = 0):
+    """
+    Write whole columns (top to bottom), going from left to right,
+    8 pixels per byte with the top pixel being the MSB.
+    Incomplete bytes at the bottom of a column are omitted.
+    Returns the number of bytes written.
+
+    data, width, height, out, offset:
+    Same as for pack_rows()
+    """
+
+    stride = (width + 7) // 8
+    bands = height // 8
+    block = bytearray(8 * stride)
+    for band in range(bands):
+        # Interleave the 8 rows of this band into 8x8 blocks
+        for row in range(8):
+            start = (band * 8 + row) * stride
+            block[row::8] = data[start:start + stride]
+        columns = transpose_blocks(block)
+        out[offset + band:offset + bands * width:bands] = columns[:width]
+    return bands * width
+
+def pack_slices(data, width, height, out, offset = 0):
+    """
+    Write horizontal slices of 8 pixels, the leftmost pixel being the LSB,
+    slices going from top to bottom, columns of slices going left to right.
+    Returns the number of bytes written.
+
+    data, width, height, out, offset:
+    Same as for pack_rows()
+    """
+
+    stride = (width + 7) // 8
+    reversed_data = bytes(data[:stride * height]).translate(REVERSED_BITS)
+    for column in range(stride):
+        start = offset + column * height
+        out[start:start + height] = reversed_data[column::stride]
+    return stride * height
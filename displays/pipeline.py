@@ -0,0 +1,279 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the code for committing bitmaps through a pipeline,
+so the next bitmap can be drawn while the previous one is being sent.
+"""
+
+import collections
+import hashlib
+import queue
+import threading
+import time
+
+from .framebuffer import Framebuffer
+
+# The stages of the pipeline
+STAGES = ('render', 'encode', 'transmit')
+
+class StageStats:
+    """
+    Timing statistics of a pipeline stage.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.max = 0.0
+        # Time spent waiting for the next stage to accept a frame
+        self.blocked = 0.0
+
+    def add(self, duration):
+        """
+        Record the processing time of a frame.
+
+        duration:
+        The time in seconds
+        """
+
+        self.count += 1
+        self.total += duration
+        self.last = duration
+        self.max = max(self.max, duration)
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'average': self.total / self.count if self.count else 0.0,
+            'last': self.last,
+            'max': self.max,
+            'blocked': self.blocked
+        }
+
+class Pipeline:
+    """
+    A three-stage pipeline for committing the bitmaps of a display.
+    Rendering (compositing layers and scene elements) is done in the
+    calling thread, which can then go on drawing the next bitmap.
+    Encoding and transmitting are done in two worker threads, connected
+    by bounded queues. If a queue is full, the stage before it waits,
+    so at most depth bitmaps are waiting for every stage.
+    """
+
+    def __init__(self, display, depth = 2):
+        """
+        display:
+        The bitmap display to commit the bitmaps of
+
+        depth:
+        The number of bitmaps that can wait between two stages
+        """
+
+        if depth < 1:
+            raise ValueError("The pipeline depth has to be at least 1")
+        self.display = display
+        self.depth = depth
+        self.stats = {stage: StageStats() for stage in STAGES}
+        self.skipped = 0
+        # The status returned by the display for the last message
+        self.last_status = None
+        # An exception raised in a worker thread, raised again
+        # by the next call of submit() or flush()
+        self.error = None
+
+        # A copy of the display encodes the bitmaps, so the display
+        # itself can be drawn on in the meantime
+        self.encoder = display._make_encoder()
+        # The digest of the bitmap the display will show once
+        # all queued messages are sent
+        self.digest = display.manager.frame_digests.get(display.port)
+        self.previous = display.committed_fb
+        # Whether the next message has to be sent in full, since sending
+        # the one before it failed
+        self.resync = False
+        # Bitmaps the pipeline is done with, reused for the next ones
+        self.free_frames = collections.deque(maxlen = 2)
+
+        self.encode_queue = queue.Queue(depth)
+        self.transmit_queue = queue.Queue(depth)
+        self.threads = [
+            threading.Thread(target = self._encode_loop, daemon = True),
+            threading.Thread(target = self._transmit_loop, daemon = True)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def _check_error(self):
+        """
+        Raise an exception that occurred in a worker thread.
+        """
+
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _put(self, target, stage, item):
+        """
+        Pass an item on to the next stage, recording how long this took.
+
+        target:
+        The queue of the next stage
+
+        stage:
+        The name of the current stage
+
+        item:
+        The item to pass on
+        """
+
+        start = time.monotonic()
+        target.put(item)
+        self.stats[stage].blocked += time.monotonic() - start
+
+    def submit(self, force = False):
+        """
+        Render the internal bitmap of the display and queue it for sending.
+        Returns once the bitmap has been taken over by the pipeline,
+        after which the display can be drawn on again.
+
+        force:
+        Whether to send the full bitmap even if it has not changed
+        """
+
+        self._check_error()
+        display = self.display
+        start = time.monotonic()
+        display.render()
+        if display.retained:
+            frame = self._get_frame()
+            frame.extract(display.fb, 0, 0)
+        else:
+            # Hand over the bitmap and start over with a blank one
+            frame = display.fb
+            display.fb = self._get_frame()
+            display._store_committed_base()
+            display.init_image()
+        self.stats['render'].add(time.monotonic() - start)
+        self._put(self.encode_queue, 'render', (frame, force))
+
+    def _get_frame(self):
+        """
+        Get a framebuffer for a bitmap, reusing one the pipeline is done
+        with if possible. Its content is undefined.
+        """
+
+        try:
+            return self.free_frames.pop()
+        except IndexError:
+            return Framebuffer(self.display.bitmap_width,
+                self.display.bitmap_height)
+
+    def _encode_loop(self):
+        """
+        Encode the queued bitmaps and queue the resulting messages.
+        """
+
+        encoder = self.encoder
+        while True:
+            item = self.encode_queue.get()
+            if item is None:
+                self.transmit_queue.put(None)
+                return
+            frame, force = item
+            start = time.monotonic()
+            try:
+                encoder.fb = frame
+                message = encoder.encode()
+                digest = hashlib.sha1(message).digest()
+                if not force and digest == self.digest:
+                    self.skipped += 1
+                    self.display.skipped_commits += 1
+                    message = None
+                    self.free_frames.append(frame)
+                else:
+                    # The message lives in the shared transmit buffer
+                    message = full = bytes(message)
+                    if not force and self.digest is not None and \
+                    self.previous is not None:
+                        update = encoder.encode_update(self.previous)
+                        if update is not None:
+                            message = bytes(update)
+                    self.digest = digest
+                    if self.previous is not None:
+                        # The display doesn't show it anymore
+                        self.free_frames.append(self.previous)
+                    self.previous = frame
+                    self.display.committed_fb = frame
+            except Exception as exc:
+                self.error = exc
+                message = None
+            self.stats['encode'].add(time.monotonic() - start)
+            if message is not None:
+                self._put(self.transmit_queue, 'encode',
+                    (message, full, digest))
+            self.encode_queue.task_done()
+
+    def _transmit_loop(self):
+        """
+        Send the queued messages to the display.
+        """
+
+        display = self.display
+        while True:
+            item = self.transmit_queue.get()
+            if item is None:
+                return
+            message, full, digest = item
+            if self.resync:
+                # Queued partial updates are based on bitmaps that
+                # might not have arrived
+                message = full
+            start = time.monotonic()
+            try:
+                self.last_status = display.send_message(message)
+                display.manager.frame_digests[display.port] = digest
+                self.resync = False
+            except Exception as exc:
+                self.error = exc
+                # The display might not show the message, so don't skip
+                # the next bitmap even if it is identical and send it
+                # in full
+                self.digest = None
+                self.resync = True
+                display.manager.frame_digests.pop(display.port, None)
+            self.stats['transmit'].add(time.monotonic() - start)
+            self.transmit_queue.task_done()
+
+    def flush(self):
+        """
+        Wait until all queued bitmaps have been sent.
+        """
+
+        self.encode_queue.join()
+        self.transmit_queue.join()
+        self._check_error()
+
+    def stop(self):
+        """
+        Send all queued bitmaps and stop the worker threads.
+        """
+
+        self.encode_queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self._check_error()
+
+    def get_stats(self):
+        """
+        Get the timing statistics of every stage in seconds.
+        """
+
+        stats = {stage: self.stats[stage].to_dict() for stage in STAGES}
+        stats['skipped'] = self.skipped
+        stats['queued'] = {
+            'encode': self.encode_queue.qsize(),
+            'transmit': self.transmit_queue.qsize()
+        }
+        return stats
@@ -0,0 +1,216 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the code for rendering the drawing operations
+of several displays at the same time in worker processes.
+"""
+
+import concurrent.futures
+
+from .display_bitmap import BitmapDisplay
+from .display_virtual import VirtualDisplay
+from .scene import Scene
+
+# Functions which can be rendered in worker processes
+POOL_FUNCS = Scene.FUNCS + ('draw', )
+
+# The font handler of a worker process
+_worker_font_handler = None
+
+# Displays used for rendering in a worker process by geometry
+_worker_displays = {}
+
+def _init_worker(font_handler):
+    """
+    Prepare a worker process.
+
+    font_handler:
+    The FontHandler to use (a new one is created if None)
+    """
+
+    global _worker_font_handler
+    _worker_font_handler = font_handler
+
+def _render(spec, data, ops):
+    """
+    Execute drawing operations in a worker process.
+    Returns the packed bitmap and the outcomes of the operations.
+
+    spec:
+    A tuple (width, height, bitmap_width, bitmap_height, default_font)
+
+    data:
+    The packed bitmap to draw on, or None to start from a blank one
+
+    ops:
+    The operations, see BitmapDisplay.draw()
+    """
+
+    display = _worker_displays.get(spec)
+    if display is None:
+        width, height, bitmap_width, bitmap_height, default_font = spec
+        display = BitmapDisplay(width, height,
+            bitmap_width = bitmap_width, bitmap_height = bitmap_height,
+            font_handler = _worker_font_handler)
+        display.DEFAULT_FONT = default_font
+        _worker_displays[spec] = display
+
+    if data is None:
+        display.fb.clear()
+    else:
+        display.fb.data[:] = data
+    outcomes = display.run_ops(ops)
+    return bytes(display.fb.data), outcomes
+
+class RenderJob:
+    """
+    The drawing operations for a single display which are rendered
+    together in a worker process.
+    """
+
+    def __init__(self, display, data):
+        """
+        display:
+        The display to render for
+
+        data:
+        The packed bitmap to draw on, or None to start from a blank one
+        """
+
+        self.display = display
+        self.data = data
+        self.ops = []
+        self.future = None
+        self.result = None
+        self.applied = False
+
+    def add(self, func, args, kwargs):
+        """
+        Add a call of a drawing function (or of draw()) to the job.
+        Returns the range of indices of the resulting operations.
+
+        func, args, kwargs:
+        The function call
+        """
+
+        start = len(self.ops)
+        if func == 'draw':
+            ops = kwargs.get('ops', args[0] if args else None)
+            if not isinstance(ops, list):
+                raise TypeError("The operations have to be a list")
+            self.ops.extend(ops)
+        else:
+            self.ops.append([func] + list(args) + [dict(kwargs)])
+        return start, len(self.ops)
+
+    def start(self, executor):
+        """
+        Start rendering the job.
+
+        executor:
+        The executor to render the job with
+        """
+
+        display = self.display
+        spec = (display.width, display.height, display.bitmap_width,
+            display.bitmap_height, display.DEFAULT_FONT)
+        self.future = executor.submit(_render, spec, self.data, self.ops)
+
+    def get_outcomes(self):
+        """
+        Wait for the job to finish and return the outcomes
+        of its operations.
+        """
+
+        if self.result is None:
+            try:
+                self.result = self.future.result()
+            except Exception as exc:
+                # The worker process failed, so every operation did
+                error = "{0}: {1}".format(type(exc).__name__, exc)
+                self.result = (None, [error] * len(self.ops))
+        return self.result[1]
+
+    def get_reply(self, func, indices):
+        """
+        Get the reply to a function call added to the job, in the same form
+        as the server would have replied if it had executed the call.
+
+        func:
+        The name of the function
+
+        indices:
+        The range of indices returned by add()
+        """
+
+        outcomes = self.get_outcomes()[indices[0]:indices[1]]
+        if func == 'draw':
+            return {'error': None,
+                'data': self.display.summarize_ops(outcomes)}
+        if isinstance(outcomes[0], str):
+            return {'error': "Exception occurred during function call"}
+        return {'error': None, 'data': None}
+
+    def apply(self):
+        """
+        Wait for the job to finish and put the rendered bitmap into
+        the display. This is only done once.
+        """
+
+        if self.applied:
+            return
+        self.get_outcomes()
+        self.applied = True
+        data = self.result[0]
+        if data is not None:
+            self.display.fb.data[:] = data
+
+class RenderPool:
+    """
+    A pool of worker processes for rendering drawing operations.
+    """
+
+    def __init__(self, processes = None, font_handler = None):
+        """
+        processes:
+        The number of worker processes (the number of CPUs if None)
+
+        font_handler:
+        The FontHandler to use in the worker processes
+        """
+
+        self.executor = concurrent.futures.ProcessPoolExecutor(processes,
+            initializer = _init_worker, initargs = (font_handler, ))
+
+    def accepts(self, display):
+        """
+        Check whether the drawing operations of a display can be rendered
+        in a worker process. This is only possible for bitmap displays
+        without state besides their bitmap. Virtual displays are excluded
+        since committing them changes other displays.
+
+        display:
+        The display to check
+        """
+
+        return isinstance(display, BitmapDisplay) and \
+            not isinstance(display, VirtualDisplay) and \
+            not display.retained and not display.layers and \
+            not len(display.scene)
+
+    def start(self, job):
+        """
+        Start rendering a job.
+
+        job:
+        The job to render
+        """
+
+        job.start(self.executor)
+
+    def shutdown(self):
+        """
+        Stop the worker processes.
+        """
+
+        self.executor.shutdown()
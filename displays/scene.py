@@ -0,0 +1,349 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the code for retained scenes, that is named elements
+which are kept by a display and only rendered again when they change.
+"""
+
+import collections
+import time
+
+from .framebuffer import Sprite
+
+class SceneElement:
+    """
+    A single element of a scene, drawn by one of the drawing functions
+    of a bitmap display.
+    """
+
+    def __init__(self, func, args, kwargs, area = None, interval = None):
+        """
+        func:
+        The name of the drawing function
+
+        args, kwargs:
+        The arguments for the drawing function
+
+        area:
+        The area the element is confined to as (left, top, width, height),
+        positions are relative to it (the whole display if None)
+
+        interval:
+        The number of seconds after which the element is rendered again,
+        counted from midnight UTC so e.g. 60 means at every full minute
+        (only rendered when changed if None)
+        """
+
+        self.func = func
+        self.args = list(args)
+        self.kwargs = dict(kwargs)
+        self.area = area
+        self.interval = interval
+        # The time the element is due to be rendered again
+        self.due = None
+        if interval is not None:
+            self.schedule(time.time())
+        # The sprites inserted by the drawing function as tuples
+        # (sprite, x, y), None if the element needs to be rendered
+        self.sprites = None
+        # The area covered by the sprites as (left, top, right, bottom),
+        # right and bottom being exclusive
+        self.bbox = None
+
+    def invalidate(self):
+        """
+        Mark the element as changed so it will be rendered again.
+        """
+
+        self.sprites = None
+
+    def schedule(self, now):
+        """
+        Calculate the next time the element is due to be rendered again.
+
+        now:
+        The current time as a UNIX timestamp
+        """
+
+        self.due = (now // self.interval + 1) * self.interval
+
+class Scene:
+    """
+    An ordered collection of named elements. Later elements are drawn
+    on top of earlier ones.
+    """
+
+    # Drawing functions which can be used for elements
+    FUNCS = ('text', 'paragraph', 'vertical_text', 'bitmap', 'line',
+        'rectangle', 'binary_clock', 'analog_clock')
+
+    def __init__(self):
+        self.elements = collections.OrderedDict()
+        # Areas that have to be composited again
+        self.dirty = []
+        # Whether the target bitmap contains the scene (apart from
+        # the dirty areas)
+        self.composited = False
+
+    def __len__(self):
+        return len(self.elements)
+
+    def set(self, name, func, args, kwargs, area = None, interval = None):
+        """
+        Add an element or replace an existing one.
+
+        name:
+        The name of the element
+
+        func, args, kwargs, area, interval:
+        Same as for SceneElement()
+        """
+
+        if func not in self.FUNCS:
+            raise ValueError("'{0}' cannot be used for scene elements"
+                .format(func))
+        if interval is not None and interval <= 0:
+            raise ValueError("The interval has to be positive")
+        self.remove(name)
+        self.elements[name] = SceneElement(func, args, kwargs, area,
+            interval)
+
+    def update(self, name, args, kwargs):
+        """
+        Change the arguments of an element. The element is rendered again
+        even if nothing is changed, e.g. to update time strings.
+
+        name:
+        The name of the element
+
+        args:
+        The new positional arguments (the old ones are kept if empty)
+
+        kwargs:
+        The keyword arguments to change
+        """
+
+        element = self.elements[name]
+        if args:
+            element.args = list(args)
+        element.kwargs.update(kwargs)
+        element.invalidate()
+
+    def remove(self, name):
+        """
+        Remove an element if it exists.
+
+        name:
+        The name of the element
+        """
+
+        element = self.elements.pop(name, None)
+        if element is not None and element.bbox is not None:
+            self.dirty.append(element.bbox)
+
+    def clear(self):
+        """
+        Remove all elements.
+        """
+
+        for name in list(self.elements):
+            self.remove(name)
+
+    def refresh(self, now = None):
+        """
+        Mark all elements which are due as changed.
+        Returns the number of elements that were due.
+
+        now:
+        The current time as a UNIX timestamp (optional)
+        """
+
+        now = time.time() if now is None else now
+        count = 0
+        for element in self.elements.values():
+            if element.due is not None and now >= element.due:
+                element.invalidate()
+                element.schedule(now)
+                count += 1
+        return count
+
+    def get_next_due(self):
+        """
+        Get the time the next element is due to be rendered again,
+        or None if no element is rendered at regular intervals.
+        """
+
+        times = [element.due for element in self.elements.values()
+            if element.due is not None]
+        return min(times) if times else None
+
+    def render_changed(self, display):
+        """
+        Render the changed elements again. The areas they covered before
+        and cover now are added to the dirty areas.
+
+        display:
+        The display whose drawing functions are used to render elements
+        """
+
+        for element in self.elements.values():
+            if element.sprites is not None:
+                continue
+            if element.bbox is not None:
+                self.dirty.append(element.bbox)
+            element.sprites = display.capture(element.func,
+                *element.args, area = element.area, **element.kwargs)
+            element.bbox = get_bbox(element.sprites)
+            if element.bbox is not None:
+                self.dirty.append(element.bbox)
+
+    def composite_region(self, fb, region, base = None):
+        """
+        Composite the scene into an area of a bitmap which already
+        contains it everywhere else.
+
+        fb:
+        The framebuffer to composite the scene into
+
+        region:
+        The area as (left, top, right, bottom)
+
+        base:
+        Same as for render()
+        """
+
+        left, top, right, bottom = region
+        if base is None:
+            fb.fill_rect(left, top, right - 1, bottom - 1, False)
+        else:
+            left, top = max(left, 0), max(top, 0)
+            right, bottom = min(right, fb.width), min(bottom, fb.height)
+            if left < right and top < bottom:
+                fb.blit(base.crop(left, top, right - left, bottom - top),
+                    left, top)
+        for element in self.elements.values():
+            for sprite, x, y in element.sprites:
+                blit_clipped(fb, sprite, x, y, region)
+
+    def render(self, display, fb, base = None):
+        """
+        Render the changed elements and composite the scene into a bitmap.
+        Only the areas covered by changed elements are composited again
+        if the bitmap already contains the scene.
+        Returns the composited area as (left, top, right, bottom)
+        or None if nothing was changed.
+
+        display:
+        The display whose drawing functions are used to render elements
+
+        fb:
+        The framebuffer to composite the scene into
+
+        base:
+        A framebuffer containing the bitmap without the scene. The areas
+        of changed elements are restored from it before the scene is
+        composited into them again (they are cleared if None).
+        """
+
+        self.render_changed(display)
+        if not self.composited:
+            self.dirty = []
+            if not self.elements:
+                # The bitmap is left as it is and doesn't have to be kept
+                # as the base
+                return None
+            self.composited = True
+            region = (0, 0, fb.width, fb.height)
+            for element in self.elements.values():
+                for sprite, x, y in element.sprites:
+                    fb.blit(sprite.pixels, x, y, sprite.mask)
+            return region
+
+        if not self.dirty:
+            return None
+
+        region = merge_bboxes(self.dirty)
+        self.dirty = []
+        self.composite_region(fb, region, base)
+        return region
+
+def get_bbox(sprites):
+    """
+    Get the area covered by a list of placed sprites
+    as (left, top, right, bottom), or None if the list is empty.
+
+    sprites:
+    A list of tuples (sprite, x, y)
+    """
+
+    return merge_bboxes([(x, y, x + sprite.width, y + sprite.height)
+        for sprite, x, y in sprites])
+
+def merge_bboxes(bboxes):
+    """
+    Get the smallest area containing all of the given areas.
+
+    bboxes:
+    A list of areas as (left, top, right, bottom)
+    """
+
+    if not bboxes:
+        return None
+    lefts, tops, rights, bottoms = zip(*bboxes)
+    return min(lefts), min(tops), max(rights), max(bottoms)
+
+def blit_clipped(fb, sprite, x, y, region):
+    """
+    Insert the part of a sprite that lies within an area.
+
+    fb:
+    The framebuffer to insert the sprite into
+
+    sprite:
+    The sprite to insert
+
+    x, y:
+    The position of the upper left corner of the sprite
+
+    region:
+    The area as (left, top, right, bottom)
+    """
+
+    clipped = clip_sprite(sprite, x, y, region)
+    if clipped is not None:
+        sprite, x, y = clipped
+        fb.blit(sprite.pixels, x, y, sprite.mask)
+
+def clip_sprite(sprite, x, y, region):
+    """
+    Get the part of a placed sprite that lies within an area
+    as a tuple (sprite, x, y), or None if there is no such part.
+
+    sprite:
+    The sprite
+
+    x, y:
+    The position of the upper left corner of the sprite
+
+    region:
+    The area as (left, top, right, bottom)
+    """
+
+    left = max(x, region[0])
+    top = max(y, region[1])
+    right = min(x + sprite.width, region[2])
+    bottom = min(y + sprite.height, region[3])
+    if left >= right or top >= bottom:
+        return None
+
+    if (left, top, right, bottom) == (x, y, x + sprite.width,
+            y + sprite.height):
+        return sprite, x, y
+
+    size = (left - x, top - y, right - left, bottom - top)
+    pixels = sprite.pixels.crop(*size)
+    if sprite.mask is None:
+        mask = None
+    else:
+        mask = sprite.mask.crop(*size)
+    return Sprite(pixels, mask), left, top
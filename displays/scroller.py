@@ -0,0 +1,181 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the code for scrolling bitmaps that are wider than
+a display across it, for displays that can't scroll on their own.
+"""
+
+import time
+
+from . import packing
+from .framebuffer import Framebuffer
+
+MODES = ('loop', 'bounce', 'gap')
+
+class Scroller:
+    """
+    Scrolls a wide bitmap across a display from right to left.
+    The bitmap is packed into columns once, so every window shown on the
+    display is a slice of that buffer. Messages are encoded ahead of time
+    and sent at a constant rate.
+    """
+
+    def __init__(self, display, fb, speed = 20, mode = 'loop', gap = 0,
+            step = 1):
+        """
+        display:
+        The bitmap display to scroll on
+
+        fb:
+        The framebuffer to scroll, as high as the display
+
+        speed:
+        The scrolling speed in columns per second
+
+        mode:
+        loop: The start of the bitmap follows its end after the gap
+        bounce: Scroll until the end of the bitmap is visible, then back
+        gap: The bitmap scrolls in from the right edge and completely out
+        at the left edge, followed by the gap
+
+        gap:
+        The number of blank columns after the end of the bitmap
+        (ignored in bounce mode)
+
+        step:
+        The number of columns to move with every frame
+        """
+
+        if mode not in MODES:
+            raise ValueError("Invalid scroll mode '{0}'".format(mode))
+        if speed <= 0 or step < 1 or gap < 0:
+            raise ValueError("Speed and step have to be positive "
+                "and the gap must not be negative")
+        self.display = display
+        self.width = display.width
+        self.height = fb.height
+        self.mode = mode
+        self.interval = step / speed
+        self.encoder = display._make_encoder()
+
+        self.canvas, self.positions = self._build(fb, mode, gap, step)
+        # Bitmaps whose height isn't a multiple of 8 can't be packed into
+        # columns, windows are cropped from the canvas instead
+        self.bands = self.height // 8
+        self.columns = None
+        if self.height % 8 == 0:
+            self.columns = bytearray(self.bands * self.canvas.width)
+            packing.pack_columns(self.canvas.data, self.canvas.width,
+                self.height, self.columns)
+        self.window_fb = Framebuffer(self.width, self.height)
+        # The encoded message for every position, filled in ahead of time
+        self.messages = [None] * len(self.positions)
+
+    def _build(self, fb, mode, gap, step):
+        """
+        Build the canvas containing every window at a fixed position,
+        so no window has to wrap around. Returns the canvas and the list
+        of window positions for one cycle.
+
+        fb, mode, gap, step:
+        Same as for Scroller()
+        """
+
+        width = self.width
+        if mode == 'bounce':
+            canvas = Framebuffer(max(fb.width, width), self.height)
+            canvas.blit(fb, 0, 0)
+            travel = canvas.width - width
+            forward = list(range(0, travel + 1, step))
+            if forward[-1] != travel:
+                forward.append(travel)
+            return canvas, forward + forward[-2:0:-1]
+
+        # One period consists of the bitmap, preceded by a blank display
+        # in gap mode and followed by the gap
+        lead = width if mode == 'gap' else 0
+        period = lead + fb.width + gap
+        # The windows near the end of a period show the start
+        # of the next period as well
+        canvas = Framebuffer(period + width, self.height)
+        for start in range(lead, canvas.width, period):
+            canvas.blit(fb, start, 0)
+        return canvas, list(range(0, period, step))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def get_columns(self, x):
+        """
+        Get the window starting at column x as a view of the packed
+        columns (top to bottom, 8 pixels per byte with the top pixel
+        being the MSB), without copying.
+
+        x:
+        The position of the left edge of the window on the canvas
+        """
+
+        if self.columns is None:
+            raise ValueError("The bitmap height is not a multiple of 8")
+        return memoryview(self.columns)[x * self.bands:
+            (x + self.width) * self.bands]
+
+    def encode(self, index):
+        """
+        Get the message showing the window at a position, encoding it
+        if it hasn't been encoded yet.
+
+        index:
+        The index of the position in the cycle
+        """
+
+        message = self.messages[index]
+        if message is not None:
+            return message
+        x = self.positions[index]
+        message = None
+        if self.columns is not None:
+            message = self.encoder.encode_columns(self.get_columns(x),
+                self.width, self.height)
+        if message is None:
+            self.window_fb.extract(self.canvas, x, 0)
+            self.encoder.fb = self.window_fb
+            message = self.encoder.encode()
+        message = bytes(message)
+        self.messages[index] = message
+        return message
+
+    def run(self, cycles = 1, duration = None, lookahead = 4):
+        """
+        Scroll the bitmap across the display. Returns the number of frames
+        sent.
+
+        cycles:
+        The number of times the whole cycle is shown
+        (indefinitely if None)
+
+        duration:
+        The maximum time to scroll for in seconds (unlimited if None)
+
+        lookahead:
+        The number of frames to encode before they are needed
+        """
+
+        count = len(self.positions)
+        total = None if cycles is None else cycles * count
+        for index in range(min(lookahead + 1, count)):
+            self.encode(index)
+
+        def _get_message(frame, deadline):
+            if total is not None and frame >= total:
+                return None
+            # Encode upcoming frames while waiting for the next one
+            index = frame % count
+            for ahead in range(1, lookahead + 1):
+                if time.monotonic() >= deadline:
+                    break
+                self.encode((index + ahead) % count)
+            return self.encode(index)
+
+        return self.display._send_paced(_get_message, self.interval,
+            duration)
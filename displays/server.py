@@ -15,6 +15,9 @@ import traceback
 
 from .error import DisplayServerError
 from .display_bitmap import BitmapDisplay
+from .display_group import DisplayGroup
+from .display_virtual import VirtualDisplay
+from .render_pool import POOL_FUNCS, RenderJob, RenderPool
 
 def receive_message(sock):
   """
@@ -72,7 +75,7 @@ def discard_message(sock):
 
 class DisplayServer:
   def __init__(self, manager, port = 1820, allowed_ip_match = None,
-    verbose = False):
+    verbose = False, render_processes = None):
     """
     manager:
     The DisplayManager instance associated with this server
@@ -86,6 +89,10 @@ class DisplayServer:
     
     verbose:
     Whether to enable debug output
+    
+    render_processes:
+    The number of worker processes to render drawing operations in,
+    no worker processes are used if this is None
     """
     
     self.running = False
@@ -98,11 +105,57 @@ class DisplayServer:
     self.displays = {}
     for port, display in self.manager.displays.items():
       self.displays[display.name] = display
+    
+    self.render_pool = None
+    if render_processes:
+      # The displays are expected to share a font handler
+      font_handlers = [display.font_handler
+        for display in self.displays.values()
+        if isinstance(display, BitmapDisplay)]
+      self.render_pool = RenderPool(render_processes,
+        font_handlers[0] if font_handlers else None)
 
     self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     # Prevent having to wait between reconnects
     self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 
+  def add_display(self, display):
+    """
+    Make a display which isn't registered with the manager available,
+    e.g. a virtual display.
+    
+    display:
+    The display to add
+    """
+    
+    if not display.name:
+      raise DisplayServerError("Displays need a name to be added")
+    self.displays[display.name] = display
+
+  def refresh_regions(self):
+    """
+    Commit all displays with regions that are due.
+    """
+    
+    for display in self.displays.values():
+      if isinstance(display, BitmapDisplay) and display.refresh_regions():
+        display.commit_regions()
+  
+  def get_timeout(self):
+    """
+    Get the time to wait for messages before the next region is due
+    (at most 5 seconds).
+    """
+    
+    timeout = 5.0
+    now = time.time()
+    for display in self.displays.values():
+      if isinstance(display, BitmapDisplay):
+        due = display.get_next_refresh()
+        if due is not None:
+          timeout = min(timeout, max(0.01, due - now))
+    return timeout
+
   def output_verbose(self, text):
     """
     Output a text to the console only if debug output is enabled.
@@ -137,14 +190,16 @@ class DisplayServer:
     """
     
     self.socket.bind(('', self.port))
-    self.socket.settimeout(5.0)
     self.output_verbose("Listening on port {0}".format(self.port))
     self.socket.listen(1)
     
     try:
       while self.running:
         try:
-          # Wait for someone to connect
+          self.refresh_regions()
+          # Wait for someone to connect, but not longer than until
+          # the next region is due
+          self.socket.settimeout(self.get_timeout())
           conn, addr = self.socket.accept()
           ip, port = addr
           if self.allowed_ip_match is not None and \
@@ -167,9 +222,7 @@ class DisplayServer:
             messages = [messages]
           
           # Collect the replies to the messages and send them all back
-          reply = []
-          for message in messages:
-            reply.append(self.process_message(message))
+          reply = self.process_messages(messages)
           
           if reply:
             send_message(conn, reply)
@@ -183,6 +236,104 @@ class DisplayServer:
       self.stop()
     finally:
       self.socket.close()
+      if self.render_pool is not None:
+        self.render_pool.shutdown()
+  
+  def process_messages(self, messages):
+    """
+    Process a list of incoming messages and return the list of replies.
+    If a render pool is used, the drawing functions called on a display
+    are collected until another function (e.g. commit) is called on it.
+    They are then rendered in a worker process while the messages for
+    the other displays are collected. All other functions are called
+    in the original order after the preceding drawing is done.
+    
+    messages:
+    The messages to process
+    """
+    
+    if self.render_pool is None:
+      return [self.process_message(message) for message in messages]
+    
+    # First pass: Collect the drawing operations into jobs
+    # and start rendering them. Every step is either a drawing operation
+    # (message, job, indices) or another call (message, jobs, None)
+    # with the jobs that have to be applied before it.
+    steps = []
+    jobs = []
+    open_jobs = {}
+    committed = set()
+    serial = set()
+    for message in messages:
+      name = message.get('display')
+      display = None
+      if message.get('action', 'display') == 'display':
+        display = self.displays.get(name)
+      if display is None or name in serial:
+        steps.append((message, [], None))
+        continue
+      if isinstance(display, (DisplayGroup, VirtualDisplay)):
+        # Groups and virtual displays draw into other displays,
+        # so everything drawn before has to be applied first
+        # and everything after them is done in this process
+        for job in open_jobs.values():
+          self.render_pool.start(job)
+        open_jobs.clear()
+        serial.update(self.displays)
+        steps.append((message, list(jobs), None))
+        continue
+      if not self.render_pool.accepts(display):
+        # E.g. retained displays are drawn on in this process
+        serial.add(name)
+        steps.append((message, [], None))
+        continue
+      
+      func = message.get('func')
+      args = message.get('args', [])
+      kwargs = message.get('kwargs', {})
+      job = open_jobs.get(name)
+      if func in POOL_FUNCS:
+        if job is None:
+          # After a commit, the bitmap is blank
+          data = None if name in committed else bytes(display.fb.data)
+          job = RenderJob(display, data)
+          open_jobs[name] = job
+          jobs.append(job)
+        try:
+          indices = job.add(func, args, kwargs)
+        except (TypeError, ValueError):
+          # Malformed arguments, let the normal call report the error
+          steps.append((message, [], None))
+        else:
+          steps.append((message, job, indices))
+        continue
+      
+      if job is not None:
+        self.render_pool.start(job)
+        del open_jobs[name]
+      if func == 'commit':
+        committed.add(name)
+      else:
+        # Other functions may change the state of the display,
+        # so everything after them is done in this process
+        serial.add(name)
+      steps.append((message, [] if job is None else [job], None))
+    for job in open_jobs.values():
+      self.render_pool.start(job)
+    
+    # Second pass: Reply in order and call all other functions once
+    # the drawing operations before them have been rendered
+    replies = []
+    for message, job, indices in steps:
+      if indices is not None:
+        replies.append(job.get_reply(message.get('func'), indices))
+        continue
+      for pending in job:
+        pending.apply()
+      replies.append(self.process_message(message))
+    for job in jobs:
+      job.apply()
+    return replies
   
   def process_message(self, message):
     """
@@ -0,0 +1,270 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the code for a ticker continuously scrolling a stream
+of text across a display.
+"""
+
+import collections
+import math
+import threading
+
+from PIL import Image, ImageDraw
+
+from .framebuffer import Framebuffer, Sprite
+
+class Ticker:
+    """
+    Scrolls text across a display from right to left while more text
+    can still be appended. Only the characters about to become visible
+    are rendered, into a ring buffer which is just wide enough for the
+    display and a lookahead, so the memory used doesn't depend
+    on the length of the text.
+    """
+
+    def __init__(self, display, font = None, size = 20, color = 'white',
+            speed = 20, step = 1, lookahead = None, top = None):
+        """
+        display:
+        The bitmap display to show the ticker on
+
+        font, size, color:
+        Same as for BitmapDisplay.text()
+
+        speed:
+        The scrolling speed in columns per second
+
+        step:
+        The number of columns to move with every frame
+
+        lookahead:
+        The number of columns rendered beyond the right edge of the
+        display (twice the font size if not specified). It is increased
+        if a character is wider.
+
+        top:
+        The y position of the top edge of the text
+        (vertically centered if not specified)
+        """
+
+        if speed <= 0 or step < 1:
+            raise ValueError("Speed and step have to be positive")
+        self.display = display
+        self.font = font or display.DEFAULT_FONT
+        self.size = size
+        self.color = color
+        self.interval = step / speed
+        self.step = step
+        self.width = display.width
+        self.height = display.height
+        self.metrics = display._get_metrics(self.font, size)
+        if top is None:
+            top = (self.height - self.metrics.line_height) // 2
+        self.top = top
+
+        lookahead = lookahead or 2 * size
+        # The ring buffer, column x of the text being at x % capacity
+        self.capacity = self.width + lookahead
+        self.ring = Framebuffer(self.capacity, self.height)
+        self.window = Framebuffer(self.width, self.height)
+        self.encoder = display._make_encoder()
+
+        # Text that hasn't been rendered yet, may be appended to
+        # from other threads
+        self.pending = collections.deque()
+        # The column at the left edge of the display
+        self.position = 0
+        # The column the next character will be rendered at
+        # (fractional for truetype fonts)
+        self.pen = float(self.width)
+        # Columns before this one are either rendered or cleared
+        self.cleared = 0
+        self.frames = 0
+        self.running = False
+        self.thread = None
+
+    def feed(self, text):
+        """
+        Append text to the ticker.
+
+        text:
+        The text to append
+        """
+
+        self.pending.extend(text)
+
+    def is_idle(self):
+        """
+        Whether all text has been scrolled out of the display.
+        """
+
+        return not self.pending and self.pen <= self.position
+
+    def _render_char(self, char):
+        """
+        Render a character at the full line height or get it
+        from the glyph cache. Returns the sprite and the advance.
+
+        char:
+        The character to render
+        """
+
+        metrics = self.metrics
+        advance, left, right, top, bottom, height = metrics.get_char(char)
+        key = (char, self.font, self.size, self.color, 'ticker')
+        sprite = self.display.glyph_cache.get(key)
+        if sprite is None:
+            width = max(1, right, math.ceil(advance))
+            height = max(metrics.line_height, bottom)
+            char_img = Image.new('1', (width, height), 0)
+            ImageDraw.Draw(char_img).text((0, 0), char, 1,
+                font = metrics.imagefont)
+            sprite = Sprite.from_mask(Framebuffer.from_image(char_img),
+                self.display._get_color(self.color))
+            self.display.glyph_cache.put(key, sprite, sprite.nbytes)
+        return sprite, advance
+
+    def _clear_to(self, end):
+        """
+        Clear the ring buffer columns up to a column of the text,
+        starting at the first one that hasn't been cleared yet.
+
+        end:
+        The column to stop before
+        """
+
+        start = max(self.cleared, end - self.capacity)
+        if start >= end:
+            return
+        left = start % self.capacity
+        right = left + end - start - 1
+        self.ring.fill_rect(left, 0, right, self.height - 1, False)
+        if right >= self.capacity:
+            self.ring.fill_rect(0, 0, right - self.capacity,
+                self.height - 1, False)
+        self.cleared = end
+
+    def _grow(self, capacity):
+        """
+        Enlarge the ring buffer, keeping the columns which are visible
+        or have already been rendered.
+
+        capacity:
+        The new capacity
+        """
+
+        ring = Framebuffer(capacity, self.height)
+        width = self.cleared - self.position
+        if width > 0:
+            # Unwrap the columns, then wrap them around the new ring buffer
+            columns = Framebuffer(width, self.height)
+            offset = self.position % self.capacity
+            columns.blit(self.ring, -offset, 0)
+            if offset + width > self.capacity:
+                columns.blit(self.ring, self.capacity - offset, 0)
+            offset = self.position % capacity
+            ring.blit(columns, offset, 0)
+            if offset + width > capacity:
+                ring.blit(columns, offset - capacity, 0)
+        self.ring = ring
+        self.capacity = capacity
+
+    def _fill(self):
+        """
+        Render pending characters as long as they fit into
+        the ring buffer.
+        """
+
+        end = self.position + self.capacity
+        if self.pending and self.pen < self.position + self.width:
+            # The ticker ran out of text, new text enters at the right edge
+            self.pen = float(self.position + self.width)
+        while self.pending:
+            sprite, advance = self._render_char(self.pending[0])
+            if sprite.width > self.capacity - self.width:
+                # The character would never fit into the lookahead
+                self._grow(self.width + sprite.width)
+                end = self.position + self.capacity
+            x = round(self.pen)
+            if x + sprite.width > end:
+                break
+            self.pending.popleft()
+            self._clear_to(x + sprite.width)
+            offset = x % self.capacity
+            self.ring.blit(sprite.pixels, offset, self.top, sprite.mask)
+            if offset + sprite.width > self.capacity:
+                self.ring.blit(sprite.pixels, offset - self.capacity,
+                    self.top, sprite.mask)
+            self.pen += advance
+
+    def next_frame(self):
+        """
+        Render the characters needed for the next frame and return it as
+        a framebuffer, which is only valid until the next call.
+        """
+
+        self._fill()
+        # Never show stale columns from a previous pass through the ring
+        self._clear_to(self.position + self.width)
+        offset = self.position % self.capacity
+        self.window.clear()
+        self.window.blit(self.ring, -offset, 0)
+        if offset + self.width > self.capacity:
+            self.window.blit(self.ring, self.capacity - offset, 0)
+        self.position += self.step
+        self.frames += 1
+        return self.window
+
+    def run(self, duration = None, until_idle = True):
+        """
+        Show the ticker on the display. Returns the number of frames sent.
+
+        duration:
+        The maximum time to run for in seconds (unlimited if None)
+
+        until_idle:
+        Whether to stop once all text has been scrolled out
+        """
+
+        self.running = True
+        return self._run(duration, until_idle)
+
+    def _run(self, duration, until_idle):
+        """
+        Show the ticker on the display until it is stopped.
+
+        duration, until_idle:
+        Same as for run()
+        """
+
+        def _get_message(frame, deadline):
+            if not self.running or (until_idle and self.is_idle()):
+                return None
+            self.encoder.fb = self.next_frame()
+            return bytes(self.encoder.encode())
+
+        try:
+            return self.display._send_paced(_get_message, self.interval,
+                duration)
+        finally:
+            self.running = False
+
+    def start(self):
+        """
+        Run the ticker in a background thread until stop() is called.
+        """
+
+        self.running = True
+        self.thread = threading.Thread(target = self._run,
+            args = (None, False), daemon = True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop the ticker.
+        """
+
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
@@ -0,0 +1,207 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the code for transition effects between two bitmaps.
+Every effect returns the list of framebuffers to show one after another,
+the last one being identical to the new bitmap.
+"""
+
+import random
+
+from .framebuffer import Framebuffer
+
+DIRECTIONS = ('left', 'right', 'up', 'down')
+
+def _check(old, new, steps, direction = 'left'):
+    """
+    Check the arguments common to all effects.
+
+    old, new, steps, direction:
+    Same as for the effects
+    """
+
+    if old.size != new.size:
+        raise ValueError("Framebuffer sizes do not match: {0} and {1}"
+            .format(old.size, new.size))
+    if steps < 1:
+        raise ValueError("At least one step is required")
+    if direction not in DIRECTIONS:
+        raise ValueError("Invalid direction '{0}'".format(direction))
+
+def _offsets(length, steps):
+    """
+    Get the distance moved after every step.
+
+    length:
+    The total distance
+
+    steps:
+    The number of steps
+    """
+
+    return [round(length * step / steps) for step in range(1, steps + 1)]
+
+def _masked(old, new, mask):
+    """
+    Combine two framebuffers, taking the pixels set in the mask from new.
+
+    old, new:
+    The framebuffers to combine
+
+    mask:
+    The framebuffer selecting the pixels of new
+    """
+
+    frame = old.copy()
+    frame.blit(new, 0, 0, mask)
+    return frame
+
+def wipe(old, new, steps, direction = 'left'):
+    """
+    Reveal the new bitmap behind an edge moving across the old one.
+
+    old:
+    The framebuffer that is currently shown
+
+    new:
+    The framebuffer to change to
+
+    steps:
+    The number of frames
+
+    direction:
+    The direction the edge moves in (left, right, up or down)
+    """
+
+    _check(old, new, steps, direction)
+    width, height = new.size
+    frames = []
+    horizontal = direction in ('left', 'right')
+    for offset in _offsets(width if horizontal else height, steps):
+        mask = Framebuffer(width, height)
+        if direction == 'left':
+            mask.fill_rect(width - offset, 0, width - 1, height - 1)
+        elif direction == 'right':
+            mask.fill_rect(0, 0, offset - 1, height - 1)
+        elif direction == 'up':
+            mask.fill_rect(0, height - offset, width - 1, height - 1)
+        else:
+            mask.fill_rect(0, 0, width - 1, offset - 1)
+        frames.append(_masked(old, new, mask))
+    return frames
+
+def _slide(old, new, steps, direction, move_old):
+    """
+    Move the new bitmap in from the edge opposite to the direction,
+    optionally moving the old one out at the same time.
+
+    old, new, steps, direction:
+    Same as for wipe()
+
+    move_old:
+    Whether the old bitmap is moved as well
+    """
+
+    _check(old, new, steps, direction)
+    width, height = new.size
+    sign_x = {'left': -1, 'right': 1}.get(direction, 0)
+    sign_y = {'up': -1, 'down': 1}.get(direction, 0)
+    length = width if sign_x else height
+    frames = []
+    for offset in _offsets(length, steps):
+        dx, dy = sign_x * offset, sign_y * offset
+        if move_old:
+            frame = Framebuffer(width, height)
+            frame.blit(old, dx, dy)
+        else:
+            frame = old.copy()
+        frame.blit(new, dx - sign_x * width, dy - sign_y * height)
+        frames.append(frame)
+    return frames
+
+def push(old, new, steps, direction = 'left'):
+    """
+    Move the old bitmap out and the new bitmap in.
+
+    old, new, steps:
+    Same as for wipe()
+
+    direction:
+    The direction both bitmaps move in (left, right, up or down)
+    """
+
+    return _slide(old, new, steps, direction, True)
+
+def scroll_in(old, new, steps, direction = 'left'):
+    """
+    Move the new bitmap in, covering the old one.
+
+    old, new, steps:
+    Same as for wipe()
+
+    direction:
+    The direction the new bitmap moves in (left, right, up or down)
+    """
+
+    return _slide(old, new, steps, direction, False)
+
+def dissolve(old, new, steps, seed = None):
+    """
+    Change the differing pixels in random order.
+
+    old, new, steps:
+    Same as for wipe()
+
+    seed:
+    The seed for the random order (random if not specified)
+    """
+
+    _check(old, new, steps)
+    diff = old ^ new
+    pixels = [(x, y) for y in range(diff.height) for x in range(diff.width)
+        if diff.get_pixel(x, y)]
+    random.Random(seed).shuffle(pixels)
+
+    mask = Framebuffer(*new.size)
+    frames = []
+    done = 0
+    for count in _offsets(len(pixels), steps):
+        for x, y in pixels[done:count]:
+            mask.set_pixel(x, y, True)
+        done = count
+        frames.append(_masked(old, new, mask))
+    return frames
+
+def flip_columns(old, new, steps, seed = None):
+    """
+    Change the differing columns in random order.
+
+    old, new, steps:
+    Same as for wipe()
+
+    seed:
+    The seed for the random order (random if not specified)
+    """
+
+    _check(old, new, steps)
+    diff = old ^ new
+    columns = [x for x in range(diff.width) if diff.get_column(x)]
+    random.Random(seed).shuffle(columns)
+
+    mask = Framebuffer(*new.size)
+    frames = []
+    done = 0
+    for count in _offsets(len(columns), steps):
+        for x in columns[done:count]:
+            mask.fill_rect(x, 0, x, mask.height - 1)
+        done = count
+        frames.append(_masked(old, new, mask))
+    return frames
+
+EFFECTS = {
+    'wipe': wipe,
+    'push': push,
+    'scroll_in': scroll_in,
+    'dissolve': dissolve,
+    'flip_columns': flip_columns,
+}
@@ -243,6 +243,28 @@ void receiveBitmap() {
   memcpy(matrixData, newBitmap, MATRIX_WIDTH * 2);
 }
 
+void receivePartialBitmap() {
+  // Receive index of the first column and number of bytes
+  byte header[2];
+  if (!readBytesOrTimeoutError(header, 2)) return;
+  byte startCol = header[0];
+  byte numBytes = header[1];
+  // Receive bitmap data
+  byte serBuf[numBytes];
+  if (!readBytesOrTimeoutError(serBuf, numBytes)) return;
+  // Start from the current bitmap and replace the received columns
+  unsigned int newBitmap[MATRIX_WIDTH];
+  memcpy(newBitmap, matrixData, MATRIX_WIDTH * 2);
+  for (int i = 0; i < numBytes; i += 2) {
+    int col = startCol + i / 2;
+    if (col >= MATRIX_WIDTH) break;
+    newBitmap[col] = (serBuf[i] << 8) + serBuf[i + 1];
+  }
+  // Write the bitmap to the matrix
+  if (activeState) setMatrix(newBitmap, matrixClean ? matrixData : NULL);
+  memcpy(matrixData, newBitmap, MATRIX_WIDTH * 2);
+}
+
 void clearSerialBuffer() {
   while (Serial.available() > 0) {
     Serial.read();
@@ -306,6 +328,11 @@ void doSerialCommunication() {
        0xA4> - Set quick update (If active, only pixels that have changed will be flipped)
          byte> - Quick Update state (OFF=0x00, ON=0x01)
       <byte - Status code
+       0xA5> - Send partial bitmap (the other columns are left unchanged):
+         byte> - Index of the first column to be replaced
+         byte> - Number of bytes to be sent (each column being two bytes)
+         data> - Bitmap data, two consecutive representing a column
+      <byte  - Status code
 
        0xAF> - Enter programming mode
       <byte - Confirmation (always 0xFF)
@@ -371,6 +398,14 @@ void doSerialCommunication() {
         break;
       }
 
+    // Send partial bitmap
+    case 0xA5: {
+        receivePartialBitmap();
+        clearSerialBuffer();
+        serialResponse(SUCCESS);
+        break;
+      }
+
     // Enter programming mode
     case 0xAF: {
         clearSerialBuffer();
@@ -1,7 +1,6 @@
 import datetime
 import displays
 import time
-from PIL import Image, ImageSequence
 
 m = displays.DisplayManager("/dev/ttyUSB0", timeout = 0.0)
 d = displays.LAWOFlipdotDisplay(126, 16, name = 'front')
@@ -21,12 +20,7 @@ while True:
         break
     time.sleep(1)
 
-for n in range(5):
-    image = Image.open("new_year.gif")
-    for frame in ImageSequence.Iterator(image):
-        frame = frame.convert("RGBA")
-        d.bitmap(frame)
-        d.commit()
+d.animate("new_year.gif", loops = 5)
 
 d.vertical_text("Frohes Neues", font = "Arial Bold", size = 13)
 d.bitmap("champagne.png", left = 61)
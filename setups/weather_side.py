@@ -63,7 +63,7 @@ else:
 
     client.set_inverting('side', False)
     client.bitmap('side', "bitmaps/weather_icons/{0}.png".format(icon), left = 0, top = 0)
-    client.text('side', status, font = "Flipdot8_Narrow", left = 18, top = 0)
+    client.text('side', status, font = "Flipdot8_Narrow", left = 18, top = 0, box = (66, None), fit = 'ellipsize')
     client.text('side', "{tn}/{tx}° {pc}% {ws}kmh".format(**w), font = "Flipdot8_Narrow", left = 18, top = 9)
 
 client.commit('side')
@@ -0,0 +1,77 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the fixtures and display managers shared by the tests.
+"""
+
+import pytest
+
+from displays.font_handler import FontHandler
+
+class LocalFontHandler(FontHandler):
+    """
+    A font handler which doesn't scan the system fonts,
+    so the tests don't depend on fc-list.
+    """
+
+    def load_fonts(self):
+        pass
+
+class RecordingManager:
+    """
+    A display manager which records the messages instead of sending them.
+    """
+
+    def __init__(self):
+        self.frame_digests = {}
+        self.sent = []
+
+    def send_message(self, port, message, expect_reply = True):
+        self.sent.append((port, bytes(message)))
+        return 0xFF
+
+class LAWOLoopback:
+    """
+    A display manager which reassembles the bitmaps sent to a LAWO display
+    the same way as its firmware.
+    """
+
+    def __init__(self, width):
+        self.columns = [0] * width
+        self.frame_digests = {}
+        self.actions = []
+        # The number of messages to fail before sending works again
+        self.failures = 0
+        # An event to wait for before every message, e.g. to hold back
+        # the transmit stage of a pipeline
+        self.gate = None
+
+    def send_message(self, port, message, expect_reply = True):
+        if self.gate is not None:
+            self.gate.wait()
+        if self.failures:
+            self.failures -= 1
+            raise IOError("Serial port disconnected")
+        message = bytes(message)
+        assert message[0] == 0xFF
+        action = message[1]
+        if action == 0xA0:
+            length = message[2]
+            data = message[3:3 + length]
+            start = 0
+        elif action == 0xA5:
+            start, length = message[2], message[3]
+            data = message[4:4 + length]
+        else:
+            raise ValueError("Unexpected action {0:#x}".format(action))
+        assert len(data) == length
+        for index in range(0, length, 2):
+            column = start + index // 2
+            if column < len(self.columns):
+                self.columns[column] = (data[index] << 8) + data[index + 1]
+        self.actions.append(action)
+        return 0xFF
+
+@pytest.fixture
+def font_handler():
+    return LocalFontHandler()
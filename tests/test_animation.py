@@ -0,0 +1,73 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the loopback tests for playing animations
+on bitmap displays.
+"""
+
+import pytest
+from PIL import Image, ImageDraw
+
+from displays import LAWOFlipdotDisplay
+
+from test_lawo_updates import full_columns, make_display
+
+def make_frames(columns):
+    """
+    Create animation frames with a vertical line at each of the columns.
+    """
+
+    frames = []
+    for x in columns:
+        img = Image.new('L', (126, 16), 0)
+        ImageDraw.Draw(img).line([(x, 0), (x, 15)], fill = 255)
+        frames.append((img, 0.001))
+    return frames
+
+def line_columns(display, *columns):
+    expected = LAWOFlipdotDisplay(126, 16, font_handler = display.font_handler)
+    for x in columns:
+        expected.rectangle([(x, 0), (x, 15)], fill = True)
+    return full_columns(display, expected.fb)
+
+def test_playback(font_handler):
+    display = make_display(font_handler)
+    result = display.animate(make_frames([0, 10, 20, 30]), loops = 2)
+    assert result['shown'] + result['dropped'] == 8
+    assert display.manager.columns == line_columns(display, 30)
+    # Frames following the shown one are sent as partial updates
+    assert 0xA5 in display.manager.actions
+
+    # The display shows the last frame, so the next commit is based on it
+    display.rectangle([(30, 0), (30, 15)], fill = True)
+    display.rectangle([(40, 0), (40, 15)], fill = True)
+    display.commit()
+    assert display.manager.actions[-1] == 0xA5
+    assert display.manager.columns == line_columns(display, 30, 40)
+
+def test_failure_during_playback(font_handler):
+    display = make_display(font_handler)
+    display.rectangle([(10, 0), (10, 15)], fill = True)
+    display.rectangle([(70, 0), (70, 15)], fill = True)
+    display.commit()
+    manager = display.manager
+    send_message = manager.send_message
+    sent = []
+
+    def _send_message(port, message, expect_reply = True):
+        if len(sent) == 2:
+            raise IOError("Serial port disconnected")
+        sent.append(message)
+        return send_message(port, message, expect_reply)
+
+    manager.send_message = _send_message
+    with pytest.raises(IOError):
+        display.animate(make_frames([0, 10, 20, 30]))
+    manager.send_message = send_message
+
+    # What the display shows is unknown, so the bitmap is sent in full
+    display.rectangle([(10, 0), (10, 15)], fill = True)
+    display.rectangle([(50, 0), (50, 15)], fill = True)
+    display.commit()
+    assert manager.actions[-1] == 0xA0
+    assert manager.columns == line_columns(display, 10, 50)
@@ -0,0 +1,62 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the tests for groups of displays.
+"""
+
+import pytest
+
+from displays import DisplayGroup, LAWOFlipdotDisplay
+
+from conftest import RecordingManager
+from test_lawo_updates import full_columns, make_display
+
+def make_group(font_handler, sizes):
+    manager = RecordingManager()
+    group = DisplayGroup('group')
+    for port, (width, height) in enumerate(sizes):
+        display = LAWOFlipdotDisplay(width, height,
+            font_handler = font_handler)
+        display.manager = manager
+        display.port = port
+        group.add_display(display)
+    return group
+
+def test_commit_reports_draw_errors(font_handler):
+    group = make_group(font_handler, [(28, 16), (28, 16), (84, 16)])
+    group.rectangle([(0, 0), (3, 3)], fill = True)
+    group.text("x", font = 'nofont')
+    group.rectangle([(40, 0), (50, 3)], fill = True)
+    result = group.commit()
+    assert result['statuses'] == [0xFF, 0xFF, 0xFF]
+    # The last rectangle is only drawn on the wide display
+    assert result['draw']['drawn'] == 2
+    assert result['draw']['culled'] == 0
+    assert [index for index, error in result['draw']['errors']] == [1]
+
+def test_commit_empty_group(font_handler):
+    group = make_group(font_handler, [])
+    group.rectangle([(0, 0), (3, 3)])
+    assert group.commit() == {'statuses': [], 'draw': None}
+
+def test_failed_send_is_not_used_as_base(font_handler):
+    display = make_display(font_handler)
+    group = DisplayGroup('group')
+    group.add_display(display)
+    group.rectangle([(0, 0), (0, 15)], fill = True)
+    group.commit()
+
+    group.rectangle([(5, 0), (5, 15)], fill = True)
+    display.manager.failures = 1
+    with pytest.raises(IOError):
+        group.commit()
+
+    # The display never received the bitmap, so it has to be sent in full
+    group.rectangle([(5, 0), (5, 15)], fill = True)
+    group.rectangle([(10, 0), (10, 15)], fill = True)
+    group.commit()
+    expected = LAWOFlipdotDisplay(126, 16, font_handler = font_handler)
+    expected.rectangle([(5, 0), (5, 15)], fill = True)
+    expected.rectangle([(10, 0), (10, 15)], fill = True)
+    assert display.manager.actions[-1] == 0xA0
+    assert display.manager.columns == full_columns(display, expected.fb)
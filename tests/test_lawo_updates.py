@@ -0,0 +1,94 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the loopback tests for the partial bitmap updates
+of LAWO flipdot displays.
+"""
+
+import random
+
+import pytest
+
+from displays import LAWOFlipdotDisplay
+
+from conftest import LAWOLoopback
+
+def full_columns(display, fb):
+    """
+    Get the columns of a bitmap as they would be sent with a full update.
+    """
+
+    reference = LAWOFlipdotDisplay(display.width, display.height,
+        font_handler = display.font_handler)
+    reference.fb = fb
+    data = bytes(reference.encode())[3:]
+    return [(data[i] << 8) + data[i + 1] for i in range(0, len(data), 2)]
+
+def make_display(font_handler, partial_updates = True):
+    display = LAWOFlipdotDisplay(126, 16, font_handler = font_handler,
+        partial_updates = partial_updates)
+    display.manager = LAWOLoopback(126)
+    display.port = 1
+    return display
+
+def draw_random(display, rng):
+    x = rng.randrange(126)
+    width = rng.randrange(1, 20)
+    display.rectangle([(x, rng.randrange(16)), (x + width, 15)],
+        fill = rng.random() < 0.5)
+
+@pytest.mark.parametrize('retained', [False, True])
+def test_reassembled_frames_match_full_frames(font_handler, retained):
+    display = make_display(font_handler)
+    display.set_retained(retained)
+    rng = random.Random(1)
+    for i in range(200):
+        for j in range(rng.randrange(3)):
+            draw_random(display, rng)
+        expected = full_columns(display, display.fb.copy())
+        display.commit()
+        assert display.manager.columns == expected
+    assert 0xA5 in display.manager.actions
+
+def test_partial_updates_are_opt_in(font_handler):
+    display = make_display(font_handler, partial_updates = False)
+    rng = random.Random(2)
+    for i in range(20):
+        draw_random(display, rng)
+        display.commit()
+    assert set(display.manager.actions) == {0xA0}
+
+def test_failed_send_is_not_used_as_base(font_handler):
+    display = make_display(font_handler)
+    display.set_retained(True)
+    display.rectangle([(0, 0), (0, 15)], fill = True)
+    display.commit()
+
+    display.rectangle([(20, 0), (22, 15)], fill = True)
+    display.manager.failures = 1
+    with pytest.raises(IOError):
+        display.commit()
+
+    # The display never received the bitmap, so it has to be sent in full
+    display.rectangle([(0, 0), (0, 15)], color = 'black', fill = True)
+    expected = full_columns(display, display.fb.copy())
+    display.commit()
+    assert display.manager.actions[-1] == 0xA0
+    assert display.manager.columns == expected
+
+@pytest.mark.parametrize('retained', [False, True])
+def test_region_refresh_keeps_bitmap(font_handler, retained):
+    display = make_display(font_handler)
+    display.set_retained(retained)
+    display.set_region('clock', (96, 0, 30, 16), 60, 'rectangle',
+        [(0, 0), (9, 15)], fill = True)
+    display.rectangle([(0, 0), (40, 15)], fill = True)
+    display.commit()
+
+    display.update_element('clock', [(0, 0), (4, 15)])
+    assert display.refresh_regions(display.get_next_refresh() + 1)
+    display.commit_regions()
+    expected = LAWOFlipdotDisplay(126, 16, font_handler = font_handler)
+    expected.rectangle([(0, 0), (40, 15)], fill = True)
+    expected.rectangle([(96, 0), (100, 15)], fill = True)
+    assert display.manager.columns == full_columns(display, expected.fb)
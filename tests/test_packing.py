@@ -0,0 +1,107 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the tests comparing the bitmap formats produced by the
+displays with the per-pixel loops they replaced.
+"""
+
+import math
+import random
+
+import pytest
+from PIL import Image
+
+from displays import ADtranzLCDisplay, AnnaxLEDDisplay, LAWOFlipdotDisplay
+from displays.display_bitmap import BitmapDisplay
+from displays.framebuffer import Framebuffer
+
+# Sizes (width, height), including ones that aren't multiples of 8
+SIZES = [(8, 8), (13, 16), (126, 16), (21, 12), (3, 7), (96, 19)]
+
+def random_image(width, height, seed):
+    """
+    Create a grayscale image with random pixel values.
+    """
+
+    rng = random.Random(seed)
+    img = Image.new('L', (width, height))
+    img.putdata([rng.choice((0, 100, 127, 128, 200, 255))
+        for i in range(width * height)])
+    return img
+
+def lawo_loop(img):
+    """
+    The bitmap format of LAWOFlipdotDisplay as it was built pixel by pixel.
+    """
+
+    pixels = img.load()
+    width, height = img.size
+    bitmap = []
+    for x in range(width):
+        col_byte = 0x00
+        for y in range(height):
+            if pixels[x, y] > 127:
+                col_byte += 1 << (8 - y%8 - 1)
+            if (y+1) % 8 == 0:
+                bitmap.append(col_byte)
+                col_byte = 0x00
+    return [0xFF, 0xA0, len(bitmap)] + bitmap
+
+def annax_loop(img):
+    """
+    The bitmap format of AnnaxLEDDisplay as it was built pixel by pixel.
+    """
+
+    pixels = img.load()
+    width, height = img.size
+    bitmap = []
+    for y in range(height):
+        for x in range(0, width, 8):
+            byte = 0x00
+            for xoff in range(8):
+                if x+xoff >= width:
+                    continue
+                byte |= (pixels[x+xoff, y] > 127) << (7-xoff)
+            bitmap.append(byte)
+    length = len(bitmap)
+    return [0xFF, 0xA0, length >> 8 & 0xFF, length & 0xFF] + bitmap
+
+def adtranz_loop(img):
+    """
+    The bitmap format of ADtranzLCDisplay as it was built pixel by pixel.
+    """
+
+    pixels = img.load()
+    width, height = img.size
+    bitmap = [0] * height * math.ceil(width/8)
+    for x in range(width):
+        for y in range(height):
+            bitmap[x//8*height + y] |= (pixels[x, y] > 127) << x%8
+    length = len(bitmap)
+    return [0xFF, 0xA0, length >> 8 & 0xFF, length & 0xFF] + bitmap
+
+@pytest.mark.parametrize('cls, loop', [
+    (LAWOFlipdotDisplay, lawo_loop),
+    (AnnaxLEDDisplay, annax_loop),
+    (ADtranzLCDisplay, adtranz_loop),
+])
+@pytest.mark.parametrize('width, height', SIZES)
+def test_encode_matches_loop(cls, loop, width, height, font_handler):
+    display = cls(width, height, font_handler = font_handler)
+    for seed in range(3):
+        img = random_image(width, height, seed)
+        display.fb = Framebuffer.from_image(img)
+        assert list(display.encode()) == loop(img)
+
+def test_tx_buffer_is_reused(font_handler):
+    display = LAWOFlipdotDisplay(126, 16, font_handler = font_handler)
+    first = display.encode()
+    display.fb.fill()
+    assert display.encode() is first
+
+def test_commit_without_bitmap_format(font_handler):
+    # Like BaseDisplay.commit(), nothing is sent and nothing is required
+    # from the display manager
+    display = BitmapDisplay(10, 10, font_handler = font_handler)
+    display.rectangle([(0, 0), (3, 3)])
+    assert display.commit() is None
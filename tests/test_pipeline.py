@@ -0,0 +1,91 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the tests for committing bitmaps through a pipeline.
+"""
+
+import random
+import threading
+import time
+
+import pytest
+
+from displays import LAWOFlipdotDisplay
+
+from conftest import LAWOLoopback
+from test_lawo_updates import draw_random, full_columns, make_display
+
+@pytest.mark.parametrize('retained', [False, True])
+def test_frames_are_recycled(font_handler, retained):
+    display = LAWOFlipdotDisplay(126, 16, font_handler = font_handler)
+    display.manager = LAWOLoopback(126)
+    display.port = 1
+    display.set_retained(retained)
+    display.start_pipeline()
+    rng = random.Random(3)
+    frames = []
+    try:
+        for i in range(100):
+            draw_random(display, rng)
+            expected = full_columns(display, display.fb.copy())
+            display.commit()
+            display.flush_pipeline()
+            if not any(fb is display.committed_fb for fb in frames):
+                frames.append(display.committed_fb)
+            assert display.manager.columns == expected
+    finally:
+        display.stop_pipeline()
+    # Only a few framebuffers are used, no matter how many are committed
+    assert len(frames) <= 4
+
+def test_failed_send_resends_queued_updates(font_handler):
+    display = make_display(font_handler)
+    display.set_retained(True)
+    display.start_pipeline()
+    try:
+        display.rectangle([(0, 0), (3, 15)], fill = True)
+        display.commit()
+        display.flush_pipeline()
+
+        # The second bitmap fails while the third one is queued
+        # as a partial update based on it
+        display.manager.gate = threading.Event()
+        display.manager.failures = 1
+        display.rectangle([(10, 0), (13, 15)], fill = True)
+        display.commit()
+        display.rectangle([(20, 0), (23, 15)], fill = True)
+        expected = full_columns(display, display.fb.copy())
+        display.commit()
+        while display.pipeline.transmit_queue.qsize() < 1:
+            time.sleep(0.001)
+        display.manager.gate.set()
+        with pytest.raises(IOError):
+            display.flush_pipeline()
+        assert display.manager.actions[-1] == 0xA0
+        assert display.manager.columns == expected
+    finally:
+        display.stop_pipeline()
+
+@pytest.mark.parametrize('func, kwargs', [
+    ('transition', {'steps': 2, 'interval': 0}),
+    ('scroll', {'speed': 10000, 'step': 42}),
+])
+def test_direct_sends_update_pipeline(font_handler, func, kwargs):
+    display = make_display(font_handler)
+    display.start_pipeline()
+    try:
+        display.rectangle([(0, 0), (3, 15)], fill = True)
+        expected = full_columns(display, display.fb.copy())
+        display.commit()
+        display.flush_pipeline()
+
+        display.rectangle([(50, 0), (53, 15)], fill = True)
+        getattr(display, func)(**kwargs)
+        assert display.manager.columns != expected
+
+        display.rectangle([(0, 0), (3, 15)], fill = True)
+        display.commit()
+        display.flush_pipeline()
+        assert display.manager.columns == expected
+    finally:
+        display.stop_pipeline()
@@ -0,0 +1,50 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the tests for compositing the retained scene
+of bitmap displays.
+"""
+
+from displays.display_bitmap import BitmapDisplay
+
+def make_display(font_handler):
+    display = BitmapDisplay(30, 20, font_handler = font_handler)
+    display.set_retained(True)
+    return display
+
+def test_changed_element_keeps_bitmap_below(font_handler):
+    display = make_display(font_handler)
+    display.rectangle([(0, 0), (29, 19)], fill = True)
+    display.set_element('box', 'rectangle', [(2, 2), (6, 6)],
+        color = 'black', fill = True)
+    display.render()
+    assert display.fb.popcount() == 600 - 25
+
+    display.update_element('box', [(3, 3), (5, 5)])
+    display.render()
+    assert display.fb.popcount() == 600 - 9
+
+def test_drawing_on_top_of_scene_is_kept(font_handler):
+    display = make_display(font_handler)
+    display.set_element('box', 'rectangle', [(0, 0), (3, 3)], fill = True)
+    display.render()
+    display.rectangle([(2, 0), (9, 0)], fill = True)
+    display.update_element('box', [(0, 0), (1, 1)])
+    display.render()
+    expected = BitmapDisplay(30, 20, font_handler = display.font_handler)
+    expected.rectangle([(2, 0), (9, 0)], fill = True)
+    expected.rectangle([(0, 0), (1, 1)], fill = True)
+    assert display.fb.data == expected.fb.data
+
+def test_changed_element_keeps_static_layer(font_handler):
+    display = make_display(font_handler)
+    display.add_layer('background', z = 0, static = True)
+    display.select_layer('background')
+    display.rectangle([(0, 0), (29, 19)], fill = True)
+    display.set_element('box', 'rectangle', [(2, 2), (6, 6)],
+        color = 'black', fill = True)
+    display.render()
+
+    display.update_element('box', [(3, 3), (5, 5)])
+    display.render()
+    assert display.fb.popcount() == 600 - 9
@@ -0,0 +1,38 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the tests for the ticker.
+"""
+
+from displays.ticker import Ticker
+
+from test_lawo_updates import make_display
+
+def get_frames(ticker, count):
+    return [bytes(ticker.next_frame().data) for i in range(count)]
+
+def test_small_lookahead(font_handler):
+    display = make_display(font_handler)
+    text = "Linie 42 Hauptbahnhof"
+    reference = Ticker(display, font = "Luminator16_Bold", lookahead = 200)
+    reference.feed(text)
+    ticker = Ticker(display, font = "Luminator16_Bold", lookahead = 4)
+    ticker.feed(text)
+    ticker.next_frame()
+    # More text arriving while characters are still being rendered
+    ticker.feed(text)
+    reference.next_frame()
+    reference.feed(text)
+    assert get_frames(ticker, 500) == get_frames(reference, 500)
+    assert ticker.is_idle()
+
+def test_run_until_idle(font_handler):
+    display = make_display(font_handler)
+    ticker = Ticker(display, font = "Flipdot8_Narrow", speed = 100000,
+        step = 8)
+    ticker.feed("12:00")
+    assert ticker.run() == len(display.manager.actions)
+    assert ticker.is_idle()
+    # The display doesn't show the internal bitmap anymore
+    assert display.port not in display.manager.frame_digests
+    assert display.committed_fb is None
@@ -0,0 +1,59 @@
+"""
+(C) 2016 Julian Metzler
+
+This file contains the tests for virtual displays.
+"""
+
+import pytest
+
+from displays import LAWOFlipdotDisplay, VirtualDisplay
+
+from conftest import RecordingManager
+
+def make_virtual(font_handler):
+    manager = RecordingManager()
+    virtual = VirtualDisplay(210, 16, font_handler = font_handler)
+    for port, (x, width) in enumerate([(0, 126), (126, 84)]):
+        display = LAWOFlipdotDisplay(width, 16, font_handler = font_handler)
+        display.manager = manager
+        display.port = port
+        virtual.add_display(display, x, 0)
+    return virtual
+
+@pytest.mark.parametrize('func, args', [
+    ('transition', ()),
+    ('scroll', ()),
+    ('animate', ([],)),
+    ('start_ticker', ("text",)),
+])
+def test_unsupported_functions(font_handler, func, args):
+    virtual = make_virtual(font_handler)
+    with pytest.raises(NotImplementedError):
+        getattr(virtual, func)(*args)
+
+def test_pipeline_for_every_display(font_handler):
+    virtual = make_virtual(font_handler)
+    virtual.start_pipeline()
+    try:
+        virtual.rectangle([(120, 0), (130, 15)], fill = True)
+        virtual.commit()
+        virtual.flush_pipeline()
+    finally:
+        virtual.stop_pipeline()
+    ports = [port for port, message in virtual.members[0][0].manager.sent]
+    assert sorted(ports) == [0, 1]
+    assert all(display.pipeline is None for display, x, y in virtual.members)
+
+def test_region_refresh_keeps_canvas(font_handler):
+    virtual = make_virtual(font_handler)
+    virtual.set_region('clock', (180, 0, 30, 16), 60, 'rectangle',
+        [(0, 0), (9, 15)], fill = True)
+    virtual.rectangle([(0, 0), (40, 15)], fill = True)
+    virtual.commit()
+
+    virtual.update_element('clock', [(0, 0), (4, 15)])
+    assert virtual.refresh_regions(virtual.get_next_refresh() + 1)
+    virtual.commit_regions()
+    front, side = [display for display, x, y in virtual.members]
+    assert front.committed_fb.popcount() == 41 * 16
+    assert side.committed_fb.popcount() == 5 * 16